@@ -1,10 +1,19 @@
+import json
+
 from app.api.database import models
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from sqlalchemy.orm import Session
 from app.chatbot.bot import TechNewsChatbot
+from app.chatbot.intent_router import IntentRouter
+from app.chatbot.speculation import SpeculativeRetriever
 from app.ir_system.system import get_retriever
-from app.config import ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, OPENAI_API_KEY
+from app.config import (ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, ES_INDEX_ALIAS, OPENAI_API_KEY, QUERY_CACHE_SIZE,
+                        QUERY_CACHE_TTL_SECONDS, RETRIEVAL_LOG_PATH, RETRIEVAL_LOG_SAMPLE_RATE, SEARCH_STRATEGY,
+                        MAX_CONTENT_CHARS, RESULT_CACHE_SIZE, RESULT_CACHE_CHECK_SECONDS, ETL_STATE_INDEX,
+                        RETRIEVER_BACKEND, LOCAL_STORE_PATH, RESCORE_CANDIDATE_POOL, RESCORE_VECTOR_WEIGHT,
+                        ROUTING_MODE, INTENT_ROUTER_THRESHOLD, INTENT_ROUTER_SHADOW_RATE, INTENT_LOG_PATH,
+                        SPECULATIVE_RETRIEVAL, SPECULATION_SIMILARITY, SPECULATION_REWRITE_DEADLINE_SECONDS)
 from app.api.database.db import SessionLocal
 from app.api.database.models import ChatSession, Message, Feedback
 from app.api.database.db import SessionLocal, engine, Base
@@ -17,7 +26,21 @@ CORS(app)
 # Create all tables
 Base.metadata.create_all(bind=engine)
 
-retriever = get_retriever(ES_HOST, ES_PORT, ES_USER, ES_PASSWORD)
+retriever = get_retriever(ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, index_name=ES_INDEX_ALIAS,
+                          query_cache_size=QUERY_CACHE_SIZE, query_cache_ttl=QUERY_CACHE_TTL_SECONDS,
+                          log_path=RETRIEVAL_LOG_PATH, log_sample_rate=RETRIEVAL_LOG_SAMPLE_RATE,
+                          strategy=SEARCH_STRATEGY, max_content_chars=MAX_CONTENT_CHARS,
+                          result_cache_size=RESULT_CACHE_SIZE, result_cache_check_seconds=RESULT_CACHE_CHECK_SECONDS,
+                          state_index=ETL_STATE_INDEX, backend=RETRIEVER_BACKEND, local_store_path=LOCAL_STORE_PATH,
+                          rescore_candidate_pool=RESCORE_CANDIDATE_POOL, rescore_vector_weight=RESCORE_VECTOR_WEIGHT)
+intent_router = None
+if ROUTING_MODE == "embedding":
+    intent_router = IntentRouter(retriever.embedder, threshold=INTENT_ROUTER_THRESHOLD, log_path=INTENT_LOG_PATH,
+                                 shadow_rate=INTENT_ROUTER_SHADOW_RATE)
+speculator = None
+if SPECULATIVE_RETRIEVAL:
+    speculator = SpeculativeRetriever(retriever, similarity_threshold=SPECULATION_SIMILARITY,
+                                      rewrite_deadline=SPECULATION_REWRITE_DEADLINE_SECONDS)
 chatbot_instances = {}
 
 
@@ -58,7 +81,8 @@ def start_session():
 
         session_id = create_chat_session(db, persona)
         chatbot_instances[session_id] = TechNewsChatbot(
-            api_key=OPENAI_API_KEY, retriever=retriever, persona=persona
+            api_key=OPENAI_API_KEY, retriever=retriever, persona=persona, routing_mode=ROUTING_MODE,
+            intent_router=intent_router, speculator=speculator
         )
 
     return jsonify({"session_id": session_id})
@@ -92,6 +116,47 @@ def ask_question():
     return jsonify({"response": response, "session_id": session_id})
 
 
+@app.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """Answers like /ask as Server-Sent Events: progress, answer tokens, then "done" once the messages are saved."""
+    data = request.get_json()
+    question = data.get('question', "").strip()
+    session_id = data.get('session_id')
+
+    if not session_id:
+        return jsonify({"error": "Session ID is required."}), 400
+
+    if not question:
+        return jsonify({"error": "Question is required."}), 400
+
+    with SessionLocal() as db:
+        chat_session = db.query(ChatSession).get(session_id)
+        if not chat_session or chat_session.closed:
+            return jsonify({"error": "This session is closed or does not exist."}), 400
+
+    chatbot = chatbot_instances.get(session_id)
+    if chatbot is None:
+        return jsonify({"error": "Chatbot instance not found for this session."}), 500
+
+    def save_messages(response: str):
+        with SessionLocal() as db:
+            add_message(db, session_id, "user", question)
+            add_message(db, session_id, "assistant", response)
+
+    # The messages are saved by the worker answering the question, also if the client disconnects.
+    try:
+        stream = chatbot.ask_question_stream(question, on_complete=save_messages)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+
+    def events():
+        for event, event_data in stream:
+            yield f"event: {event}\ndata: {json.dumps(event_data)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @app.route('/history/<int:session_id>', methods=['GET'])
 def get_history(session_id):
     with SessionLocal() as db:
@@ -109,6 +174,16 @@ def close_chat(session_id):
         return jsonify({"message": "Session closed."})
 
 
+@app.route('/stats', methods=['GET'])
+def retriever_stats():
+    stats = retriever.cache_stats()
+    if intent_router is not None:
+        stats["intent_router"] = intent_router.stats()
+    if speculator is not None:
+        stats["speculation"] = speculator.stats()
+    return jsonify(stats)
+
+
 @app.route('/feedback', methods=['POST'])
 def collect_feedback():
     data = request.get_json()
@@ -0,0 +1,210 @@
+"""
+Benchmarks of the chatbot's routing modes, end to end against the configured LLM and retriever.
+
+Run with `python -m app.chatbot.benchmark [mode ...] [spec] [stream]`, or
+`python -m app.chatbot.benchmark classifier [int8]` for the local IR classifier.
+"""
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.chatbot.bot import TechNewsChatbot
+from app.chatbot.intent_classifier import RunInformationRetrievalClassifier
+from app.chatbot.routing import ROUTING_MODES
+
+DEFAULT_QUESTIONS = [
+    "What are the latest updates in AI research?",
+    "Explain how neural networks work.",
+    "What happened this week in cybersecurity?",
+    "Any news on the latest iPhone release?",
+    "How does a quantum computer work?",
+    "What did Nvidia announce in the past few days?",
+    "Define blockchain technology.",
+    "Recent advancements in self-driving cars?",
+    "Is there anything new about Microsoft Windows today?",
+    "Describe the process of software development."
+]
+
+# Held-out labelled questions, none of them among the few-shot examples of the classifier prompt.
+LABELLED_QUESTIONS = [
+    ("What did Nvidia announce in the past few days?", True),
+    ("Is there anything new about Microsoft Windows today?", True),
+    ("What are the newest features in the latest Android release?", True),
+    ("Which startups raised funding in AI this week?", True),
+    ("Any recent data breaches reported by major companies?", True),
+    ("What is the current state of the EU AI regulation?", True),
+    ("How does public key cryptography work?", False),
+    ("What is the difference between RAM and ROM?", False),
+    ("Explain the CAP theorem.", False),
+    ("What are the best hiking trails in Colorado?", False),
+    ("How do I reverse a linked list in Python?", False),
+    ("What does a load balancer do?", False)
+]
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+def benchmark_routing(api_key: str, retriever, questions: List[str] = DEFAULT_QUESTIONS,
+                      modes: Optional[List[str]] = None, persona: str = "technical",
+                      intent_router=None, speculator=None, stream: bool = False) -> Dict[str, dict]:
+    """
+    Answers every question once per routing mode, each in a fresh conversation, and compares the
+    time to answer and how often the modes agree on whether retrieval is needed. With a speculator,
+    every mode also runs with speculative retrieval.
+
+    Parameters:
+        api_key (str): The API key for OpenAI.
+        retriever: The information retriever instance.
+        questions (List[str]): Questions to answer.
+        modes (Optional[List[str]]): Routing modes to compare, all of them by default.
+        persona (str): The user persona.
+        intent_router (IntentRouter): The local intent router, used by the "embedding" mode.
+        speculator (SpeculativeRetriever): Adds a "<mode>+spec" variant of every mode.
+        stream (bool): Stream the answers, and report the mean time to the first token.
+
+    Returns:
+        Dict[str, dict]: Mean routing time, p50/p95/mean time to answer (ms), share of questions routed
+        to retrieval and agreement with the first mode, per mode.
+    """
+    modes = modes or list(ROUTING_MODES)
+    variants = [(mode, mode, None) for mode in modes]
+    if speculator is not None:
+        variants += [(f"{mode}+spec", mode, speculator) for mode in modes]
+
+    decisions = {}
+    report = {}
+    for name, mode, variant_speculator in variants:
+        timings = []
+        decisions[name] = []
+        for question in questions:
+            chatbot = TechNewsChatbot(api_key=api_key, retriever=retriever, persona=persona, routing_mode=mode,
+                                      intent_router=intent_router, speculator=variant_speculator)
+            if stream:
+                for _ in chatbot.ask_question_stream(question):
+                    pass
+            else:
+                chatbot.ask_question(question)
+            timings.append(chatbot.last_timings)
+            decisions[name].append("retrieval_ms" in chatbot.last_timings)
+
+        totals = [timing["total_ms"] for timing in timings]
+        report[name] = {
+            "routing_ms": statistics.mean(timing.get("routing_ms", 0.0) for timing in timings),
+            "p50_ms": _percentile(totals, 50),
+            "p95_ms": _percentile(totals, 95),
+            "mean_ms": statistics.mean(totals),
+            "ir_share": statistics.mean(decisions[name]),
+            "agreement": statistics.mean(a == b for a, b in zip(decisions[name], decisions[modes[0]]))
+        }
+        if stream:
+            report[name]["first_token_ms"] = statistics.mean(timing.get("first_token_ms", 0.0)
+                                                             for timing in timings)
+
+    return report
+
+
+def benchmark_intent_classifier(examples: List[Tuple[str, bool]] = LABELLED_QUESTIONS,
+                                model_name: str = "google/flan-t5-large", quantize: bool = False,
+                                calibration_examples: Optional[List[Tuple[str, bool]]] = None) -> Dict[str, dict]:
+    """
+    Compares the beam search path of the local IR classifier with the single-step scoring path,
+    one query at a time and batched, and optionally with the int8 quantized model.
+
+    Parameters:
+        examples (List[Tuple[str, bool]]): Labelled (query, needs_ir) pairs.
+        model_name (str): The classifier model.
+        quantize (bool): Also benchmark the dynamically quantized model (CPU only).
+        calibration_examples (Optional[List[Tuple[str, bool]]]): Labelled queries to calibrate the
+            scoring path on, kept uncalibrated when None.
+
+    Returns:
+        Dict[str, dict]: Mean and p95 latency per query (ms), accuracy and agreement with the
+        generate path, per variant.
+    """
+    queries = [query for query, _ in examples]
+    labels = [needs_ir for _, needs_ir in examples]
+
+    classifiers = {"full": RunInformationRetrievalClassifier(model_name)}
+    if quantize:
+        classifiers["int8"] = RunInformationRetrievalClassifier(model_name, quantize=True)
+    if calibration_examples:
+        for classifier in classifiers.values():
+            print(f"Calibration (scale, bias): {classifier.calibrate(calibration_examples)}")
+
+    variants = {"generate": lambda query: classifiers["full"].classify(query) == "yes"}
+    for name, classifier in classifiers.items():
+        variants[f"score_{name}"] = lambda query, classifier=classifier: classifier.score(query) >= 0.5
+
+    report = {}
+    reference = None
+    for name, predict in variants.items():
+        timings = []
+        predictions = []
+        for query in queries:
+            started = time.perf_counter()
+            predictions.append(predict(query))
+            timings.append((time.perf_counter() - started) * 1000)
+        reference = reference or predictions
+        report[name] = _classifier_row(timings, predictions, labels, reference)
+
+    for name, classifier in classifiers.items():
+        started = time.perf_counter()
+        predictions = [answer == "yes" for answer in classifier.classify_batch(queries)]
+        elapsed = (time.perf_counter() - started) * 1000 / len(queries)
+        report[f"batch_{name}"] = _classifier_row([elapsed], predictions, labels, reference)
+
+    return report
+
+
+def _classifier_row(timings: List[float], predictions: List[bool], labels: List[bool], reference: List[bool]) -> dict:
+    return {
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": _percentile(timings, 95),
+        "accuracy": statistics.mean(p == label for p, label in zip(predictions, labels)),
+        "agreement": statistics.mean(p == r for p, r in zip(predictions, reference))
+    }
+
+
+if __name__ == "__main__":
+    from app.config import OPENAI_API_KEY, ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, ES_INDEX_ALIAS, INTENT_LOG_PATH
+    from app.chatbot.intent_router import IntentRouter, load_labelled_traffic
+    from app.chatbot.speculation import SpeculativeRetriever
+    from app.ir_system.system import get_retriever
+
+    if sys.argv[1:2] == ["classifier"]:
+        results = benchmark_intent_classifier(quantize="int8" in sys.argv[2:],
+                                              calibration_examples=load_labelled_traffic(INTENT_LOG_PATH))
+        columns = list(next(iter(results.values())).keys())
+        print(f"{'variant':<14}" + "".join(f"{column:>12}" for column in columns))
+        for name, row in results.items():
+            print(f"{name:<14}" + "".join(f"{value:>12.3f}" for value in row.values()))
+        sys.exit()
+
+    # Without the result cache, so the mode that runs second does not reuse the searches of the first.
+    benchmark_retriever = get_retriever(ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, index_name=ES_INDEX_ALIAS,
+                                        result_cache_size=0)
+    benchmark_stream = "stream" in sys.argv[1:]
+    if benchmark_stream:
+        sys.argv.remove("stream")
+    benchmark_speculator = None
+    if "spec" in sys.argv[1:]:
+        sys.argv.remove("spec")
+        benchmark_speculator = SpeculativeRetriever(benchmark_retriever)
+    benchmark_modes = sys.argv[1:] or list(ROUTING_MODES)
+    benchmark_intent_router = None
+    if "embedding" in benchmark_modes:
+        # Without a decision log, so the benchmark questions do not become training examples.
+        benchmark_intent_router = IntentRouter(benchmark_retriever.embedder)
+    results = benchmark_routing(OPENAI_API_KEY, benchmark_retriever, modes=benchmark_modes,
+                                intent_router=benchmark_intent_router, speculator=benchmark_speculator, stream=benchmark_stream)
+
+    columns = list(next(iter(results.values())).keys())
+    print(f"{'mode':<18}" + "".join(f"{column:>12}" for column in columns))
+    for name, row in results.items():
+        print(f"{name:<18}" + "".join(f"{value:>12.3f}" for value in row.values()))
+    if benchmark_speculator is not None:
+        print("Speculation:", benchmark_speculator.stats())
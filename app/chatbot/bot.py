@@ -1,9 +1,18 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
 from langchain_openai import ChatOpenAI
 from app.chatbot.prompt_manager import PromptManager
+from app.chatbot.routing import ROUTING_MODES, RoutingDecision
+from app.ir_system.query_filters import parse_query_filters
 
 
 class TechNewsChatbot:
-    def __init__(self, api_key: str, retriever=None, persona="technical"):
+    def __init__(self, api_key: str, retriever=None, persona="technical", routing_mode="multi_call",
+                 intent_router=None, speculator=None):
         """
         Initializes the Tech News chatbot with a persona and a OpenAI LLM instance.
 
@@ -11,14 +20,125 @@ class TechNewsChatbot:
             api_key (str): The API key for OpenAI.
             retriever: The information retriever instance (optional).
             persona (str): The user persona, either "technical" or "non-technical".
+            routing_mode (str): "multi_call" asks the LLM whether IR is needed and then for the search query,
+                "structured" gets the decision, query and filters from one structured-output call,
+                "embedding" lets the local intent router decide and asks the LLM only when it is unsure.
+            intent_router (IntentRouter): The shared local intent router, required in "embedding" mode.
+            speculator (SpeculativeRetriever): The shared speculator; when set, retrieval for the question
+                starts in parallel with routing and query generation.
         """
+        if routing_mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode '{routing_mode}', expected one of {ROUTING_MODES}.")
+        if routing_mode == "embedding" and intent_router is None:
+            raise ValueError("The 'embedding' routing mode needs an intent router.")
+
         self.llm = ChatOpenAI(api_key=api_key, model_name="gpt-4o-mini", temperature=0.2)
+        self.router = self.llm.with_structured_output(RoutingDecision)
+        self.routing_mode = routing_mode
+        self.intent_router = intent_router
+        self.speculator = speculator if retriever is not None else None
         self.retriever = retriever
+        self.last_ir_query = None
         self.chat_history = []
         self.persona_manager = PromptManager(persona)
+        self.last_timings = {}
+        # Per-thread state of the question being answered: the event queue of its stream and its start time.
+        self._local = threading.local()
+        self._streaming = threading.Lock()
 
         self.initial_instruction = self.persona_manager.get_instructions()
 
+    @contextmanager
+    def timed(self, stage: str):
+        """Records the duration of a stage of the current question in `last_timings`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.last_timings[f"{stage}_ms"] = (time.perf_counter() - started) * 1000
+
+    def emit(self, event: str, data: dict) -> None:
+        """Sends a progress event to the stream of the current question, if it is streamed."""
+        events = getattr(self._local, "events", None)
+        if events is not None:
+            events.put((event, data))
+
+    def generate_answer(self, prompt: str) -> str:
+        """
+        Generates the final answer, streaming its tokens as "token" events when the question is streamed.
+
+        Parameters:
+            prompt (str): The final prompt.
+
+        Returns:
+            str: The complete answer.
+        """
+        with self.timed("answer"):
+            if getattr(self._local, "events", None) is None:
+                return self.llm.invoke(prompt).content.strip()
+
+            chunks = []
+            for chunk in self.llm.stream(prompt):
+                if chunk.content:
+                    if not chunks:
+                        self.last_timings["first_token_ms"] = (time.perf_counter() - self._local.started) * 1000
+                    chunks.append(chunk.content)
+                    self.emit("token", {"text": chunk.content})
+            return "".join(chunks).strip()
+
+    def ask_question_stream(self, question: str,
+                            on_complete: Optional[Callable[[str], None]] = None) -> Iterator[Tuple[str, dict]]:
+        """
+        Starts answering the user's question like `ask_question` in a worker thread, and returns the
+        progress events: "routing" once the IR decision is made, "retrieval" once the articles are found,
+        "token" for every chunk of the answer, and finally "done" with the complete response, or "error".
+
+        The answer is completed, and `on_complete` called, even if the events stop being read.
+
+        Parameters:
+            question (str): The user's question.
+            on_complete (Optional[Callable[[str], None]]): Called with the response in the worker thread
+                once it is added to the chat history, before the "done" event, e.g. to save the messages.
+
+        Returns:
+            Iterator[Tuple[str, dict]]: The event names and their data.
+
+        Raises:
+            RuntimeError: If a streamed question of this chatbot is still being answered.
+        """
+        if not self._streaming.acquire(blocking=False):
+            raise RuntimeError("A question is already being answered in this session.")
+
+        events = queue.Queue()
+        result = {}
+
+        def run():
+            self._local.events = events
+            try:
+                response = self.ask_question(question)
+                if on_complete is not None:
+                    on_complete(response)
+                result["response"] = response
+            except Exception as e:
+                print(f"Failed to answer the question: {e}")
+                result["error"] = str(e)
+            finally:
+                self._local.events = None
+                self._streaming.release()
+                events.put(None)
+
+        threading.Thread(target=run, name="chatbot-stream", daemon=True).start()
+        return self._stream_events(events, result)
+
+    def _stream_events(self, events: queue.Queue, result: dict) -> Iterator[Tuple[str, dict]]:
+        while (item := events.get()) is not None:
+            yield item
+
+        if "error" in result:
+            yield "error", {"message": result["error"]}
+        else:
+            yield "done", {"response": result["response"], "timings": self.last_timings}
+
     def ask_question(self, question: str) -> str:
         """
         Processes the user's question, decides if IR is needed, and generates the response.
@@ -29,6 +149,8 @@ class TechNewsChatbot:
         Returns:
             str: The chatbot's response.
         """
+        started = self._local.started = time.perf_counter()
+        self.last_timings = {}
         self.current_question = question
 
         self.chat_history.append({"role": "user", "content": question})
@@ -42,17 +164,79 @@ class TechNewsChatbot:
         if self.is_short_or_unclear(question):
             response = self.handle_short_input(question)
         else:
-            ir_needed = self.check_ir_needed(question)
-            print("IR needed:", ir_needed)
-
-            if ir_needed and self.retriever is not None:
-                response = self.handle_ir_question(question)
-            else:
-                response = self.handle_general_question(question)
+            speculation = None
+            if self.speculator is not None:
+                speculation = self.speculator.start(question, self.retrieve, previous_query=self.last_ir_query)
+
+            try:
+                routing = self.route(question)
+                print("IR needed:", routing.needs_ir)
+                self.emit("routing", {"needs_ir": routing.needs_ir})
+
+                if routing.needs_ir and self.retriever is not None:
+                    response = self.handle_ir_question(question, routing, speculation)
+                else:
+                    if speculation is not None:
+                        speculation.discard(not_needed=True)
+                    response = self.handle_general_question(question)
+            finally:
+                # Cancels the retrievals of a speculation left unresolved because routing or answering raised.
+                if speculation is not None:
+                    speculation.discard()
         self.chat_history.append({"role": "assistant", "content": response})
 
+        self.last_timings["total_ms"] = (time.perf_counter() - started) * 1000
+        print("Timings:", ", ".join(f"{stage} {ms:.0f}" for stage, ms in self.last_timings.items()))
+
         return response
 
+    def route(self, question: str) -> RoutingDecision:
+        """
+        Decides if the question needs information retrieval. In structured mode, the same call also writes
+        the search query and filters; if it fails, the multi-call classifier is used instead. In embedding
+        mode, the local intent router decides and falls back to the multi-call classifier when unsure.
+
+        Parameters:
+            question (str): The user's question.
+
+        Returns:
+            RoutingDecision: The routing decision, without a search query in multi-call mode.
+        """
+        with self.timed("routing"):
+            if self.routing_mode == "structured":
+                try:
+                    return self.route_structured(question)
+                except Exception as e:
+                    print(f"Structured routing failed, falling back to the classifier: {e}")
+            elif self.routing_mode == "embedding":
+                return RoutingDecision(needs_ir=self.intent_router.decide(question, self.check_ir_needed))
+            return RoutingDecision(needs_ir=self.check_ir_needed(question))
+
+    def route_structured(self, question: str) -> RoutingDecision:
+        """
+        Gets the IR decision, search query and filters from a single structured-output call.
+
+        Parameters:
+            question (str): The user's question.
+
+        Returns:
+            RoutingDecision: The routing decision.
+        """
+        routing_template = self.persona_manager.get_routing_template()
+        conversation = self.format_chat_history_for_ir(max_turns=2)
+        prompt = routing_template.format(conversation=conversation, question=question)
+
+        print("\n=== Structured Routing Prompt ===")
+        print(prompt)
+        print("=================================\n")
+
+        decision = self.router.invoke(prompt)
+        print("\n=== Structured Routing Response ===")
+        print(decision)
+        print("===================================\n")
+
+        return decision
+
     def is_short_or_unclear(self, text):
         """
         Determines if the user's input is short or unclear.
@@ -83,7 +267,7 @@ class TechNewsChatbot:
         print(prompt)
         print("================================\n")
 
-        response = self.llm.invoke(prompt).content.strip()
+        response = self.generate_answer(prompt)
         return response
 
     def check_ir_needed(self, question: str) -> bool:
@@ -112,23 +296,44 @@ class TechNewsChatbot:
         ir_needed = ir_decision == "ir: yes"
         return ir_needed
 
-    def handle_ir_question(self, question: str) -> str:
+    def handle_ir_question(self, question: str, routing: RoutingDecision = None, speculation=None) -> str:
         """
         Handles questions that require information retrieval.
 
         Parameters:
             question (str): The user's question.
+            routing (RoutingDecision): The routing decision; when it carries a search query, no separate
+                query generation call is made.
+            speculation (Speculation): The retrievals started with routing, used instead of a new search
+                when one of them matches the final query.
 
         Returns:
             str: The chatbot's response.
         """
-        ir_query = self.generate_ir_query(question)
+        now = speculation.now if speculation is not None else None
+        if routing is not None and routing.search_query:
+            ir_query = routing.search_query
+            search_query, filters = ir_query, routing.filters(now, question)
+            if filters is None:
+                search_query, filters = parse_query_filters(ir_query, now)
+        else:
+            with self.timed("query"):
+                if speculation is not None:
+                    ir_query = speculation.rewrite(lambda: self.generate_ir_query(question)) or question
+                else:
+                    ir_query = self.generate_ir_query(question)
+            search_query, filters = parse_query_filters(ir_query, now)
+        self.last_ir_query = ir_query
 
         print("\n=== Generated IR Query ===")
         print(ir_query)
         print("==========================\n")
 
-        retrieved_docs = self.retriever.get_relevant_documents(ir_query)
+        with self.timed("retrieval"):
+            retrieved_docs = speculation.resolve(search_query, filters) if speculation is not None else None
+            if retrieved_docs is None:
+                retrieved_docs = self.retrieve(ir_query, search_query, filters)
+        self.emit("retrieval", {"query": ir_query, "documents": len(retrieved_docs)})
 
         if retrieved_docs:
             context = "\n\n".join(
@@ -146,7 +351,7 @@ class TechNewsChatbot:
             print(prompt)
             print("====================================\n")
 
-            response = self.llm.invoke(prompt).content.strip()
+            response = self.generate_answer(prompt)
         else:
             no_info_template = self.persona_manager.get_no_relevant_info_template()
             conversation = self.format_chat_history(max_turns=3)
@@ -156,10 +361,30 @@ class TechNewsChatbot:
             print(prompt)
             print("=========================================\n")
 
-            response = self.llm.invoke(prompt).content.strip()
+            response = self.generate_answer(prompt)
 
         return response
 
+    def retrieve(self, ir_query: str, search_query: str, filters=None) -> list:
+        """
+        Searches with the filters of the IR query, and without them if nothing matches.
+
+        Parameters:
+            ir_query (str): The IR query.
+            search_query (str): The IR query without its time expression.
+            filters (SearchFilters): The filters parsed from the IR query, if any.
+
+        Returns:
+            list: The retrieved documents.
+        """
+        if filters:
+            print(f"Filters: {filters}, searching for '{search_query}'")
+            retrieved_docs = self.retriever.search(search_query, filters=filters)
+            if retrieved_docs:
+                return retrieved_docs
+            print("No documents match the filters, searching without them.")
+        return self.retriever.get_relevant_documents(ir_query)
+
     def generate_ir_query(self, question: str) -> str:
         """
         Generates an IR query based on the chat history and current question.
@@ -204,7 +429,7 @@ class TechNewsChatbot:
         print(prompt)
         print("==========================================\n")
 
-        response = self.llm.invoke(prompt).content.strip()
+        response = self.generate_answer(prompt)
         return response
 
     def format_chat_history(self, max_turns=3) -> str:
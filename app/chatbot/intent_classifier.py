@@ -1,20 +1,69 @@
+from typing import List, Tuple
+
+import numpy as np
 import torch
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
 
+from app.chatbot.routing import IR_INTENT_EXAMPLES
+
 
 class RunInformationRetrievalClassifier:
-    def __init__(self, model_name="google/flan-t5-large"):
+    def __init__(self, model_name="google/flan-t5-large", scoring=False, quantize=False, batch_size=16):
         """
         Initializes the classifier using an instruction-tuned model like FLAN-T5 Large,
         with support for running on a CUDA-enabled GPU.
 
         Args:
             model_name (str): The name of the model to use.
+            scoring (bool): Make `classify` read the "yes"/"no" logits of the first decoder step
+                instead of generating the answer with beam search.
+            quantize (bool): Apply dynamic int8 quantization to the linear layers, only on CPU.
+            batch_size (int): Default number of queries per forward pass of `classify_batch`.
         """
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model = self.model.to(self.device)
+        self.model.eval()
+        self.scoring = scoring
+        self.batch_size = batch_size
+
+        if quantize:
+            if self.device.type == "cpu":
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+            else:
+                print("Dynamic int8 quantization is only supported on CPU, keeping the full precision model.")
+
+        examples = "\n".join(
+            f"{idx + 1}. User query: '{query}' -> {'yes' if needs_ir else 'no'}"
+            for idx, (query, needs_ir) in enumerate(IR_INTENT_EXAMPLES)
+        )
+        instruction = (
+            "You are an AI assistant. Determine if the following user query requires retrieving "
+            "the latest information, such as technology news, recent updates, or breaking news, "
+            "and ensure the query is related to technology, programming, or the tech industry. "
+            "Respond with 'yes' if the query both asks for recent or time-sensitive tech-related information, "
+            "otherwise respond with 'no'.\n\n"
+            "Examples:\n"
+            f"{examples}\n\n"
+        )
+        # The instruction is tokenized once. Its encoder states cannot be cached as well: the T5 encoder
+        # attends in both directions, so every token of the prefix depends on the query appended to it.
+        self.prefix_ids = self.tokenizer(instruction, add_special_tokens=False)["input_ids"]
+
+        self.yes_id = self.tokenizer("yes", add_special_tokens=False)["input_ids"][0]
+        self.no_id = self.tokenizer("no", add_special_tokens=False)["input_ids"][0]
+        self.decoder_start_id = self.model.config.decoder_start_token_id
+
+        # Platt scaling of the yes/no logit margin, the identity until `calibrate` is called.
+        self.calibration = (1.0, 0.0)
+
+    def _encode(self, user_inputs: List[str]) -> dict:
+        """Appends each query to the pre-tokenized instruction and pads them into one batch."""
+        suffixes = self.tokenizer([f"User query: {user_input}" for user_input in user_inputs])["input_ids"]
+        batch = self.tokenizer.pad({"input_ids": [self.prefix_ids + suffix for suffix in suffixes]},
+                                   return_tensors="pt")
+        return {name: tensor.to(self.device) for name, tensor in batch.items()}
 
     def classify(self, user_input: str) -> str:
         """
@@ -27,33 +76,105 @@ class RunInformationRetrievalClassifier:
             str: 'yes' if the query asks for tech-related, time-sensitive information requiring IR,
                  'no' otherwise.
         """
-        instruction = (
-            "You are an AI assistant. Determine if the following user query requires retrieving "
-            "the latest information, such as technology news, recent updates, or breaking news, "
-            "and ensure the query is related to technology, programming, or the tech industry. "
-            "Respond with 'yes' if the query both asks for recent or time-sensitive tech-related information, "
-            "otherwise respond with 'no'.\n\n"
-            "Examples:\n"
-            "1. User query: 'What are the latest updates in AI research?' -> yes\n"
-            "2. User query: 'Explain how neural networks work.' -> no\n"
-            "3. User query: 'What happened last week in cybersecurity?' -> yes\n"
-            "4. User query: 'Define blockchain technology.' -> no\n"
-            "5. User query: 'Any news on the latest iPhone release?' -> yes\n"
-            "6. User query: 'How does a quantum computer work?' -> no\n"
-            "7. User query: 'What’s trending in tech this month?' -> yes\n"
-            "8. User query: 'Describe the process of software development.' -> no\n"
-            "9. User query: 'Recent advancements in self-driving cars?' -> yes\n"
-            "10. User query: 'What is the meaning of IoT?' -> no\n"
-            "11. User query: 'Can you give me the latest trends in renewable energy?' -> no\n"
-            "12. User query: 'What’s new in the world of quantum computing?' -> yes\n"
-            "13. User query: 'How do I bake a cake?' -> no\n"
-            "14. User query: 'Any breaking news on cybersecurity threats?' -> yes\n"
-            "15. User query: 'Tell me about the latest developments in AI ethics.' -> yes\n\n"
-            f"User query: {user_input}"
-        )
+        if self.scoring:
+            return "yes" if self.score(user_input) >= 0.5 else "no"
 
-        inputs = self.tokenizer(instruction, return_tensors="pt").to(self.device)
-        outputs = self.model.generate(**inputs, max_length=10, num_beams=5, early_stopping=True)
+        inputs = self._encode([user_input])
+        with torch.inference_mode():
+            outputs = self.model.generate(**inputs, max_length=10, num_beams=5, early_stopping=True)
         response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
 
         return response.strip().lower()
+
+    def margins(self, user_inputs: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Runs the encoder and a single decoder step, and returns the logit of "yes" minus the logit of "no".
+
+        Args:
+            user_inputs (List[str]): The user's input texts.
+            batch_size (int): Number of queries per forward pass, defaults to `self.batch_size`.
+
+        Returns:
+            np.ndarray: One margin per query, positive when "yes" is the more likely answer.
+        """
+        batch_size = batch_size or self.batch_size
+        margins = np.empty(len(user_inputs), dtype=np.float32)
+
+        for start in range(0, len(user_inputs), batch_size):
+            inputs = self._encode(user_inputs[start:start + batch_size])
+            decoder_input_ids = torch.full((inputs["input_ids"].shape[0], 1), self.decoder_start_id,
+                                           dtype=torch.long, device=self.device)
+            with torch.inference_mode():
+                logits = self.model(**inputs, decoder_input_ids=decoder_input_ids).logits[:, 0]
+            margins[start:start + batch_size] = (logits[:, self.yes_id] - logits[:, self.no_id]).float().cpu().numpy()
+
+        return margins
+
+    def score_batch(self, user_inputs: List[str], batch_size: int = None) -> np.ndarray:
+        """
+        Returns the calibrated probability that each query requires information retrieval.
+
+        Args:
+            user_inputs (List[str]): The user's input texts.
+            batch_size (int): Number of queries per forward pass, defaults to `self.batch_size`.
+
+        Returns:
+            np.ndarray: One probability per query.
+        """
+        scale, bias = self.calibration
+        return 1.0 / (1.0 + np.exp(-(scale * self.margins(user_inputs, batch_size) + bias)))
+
+    def score(self, user_input: str) -> float:
+        """
+        Returns the calibrated probability that the query requires information retrieval.
+
+        Args:
+            user_input (str): The user's input text.
+
+        Returns:
+            float: The probability of a "yes" answer.
+        """
+        return float(self.score_batch([user_input])[0])
+
+    def classify_batch(self, user_inputs: List[str], threshold: float = 0.5, batch_size: int = None) -> List[str]:
+        """
+        Classifies many queries with the scoring mode, in batched forward passes.
+
+        Args:
+            user_inputs (List[str]): The user's input texts.
+            threshold (float): Minimum probability of a 'yes'.
+            batch_size (int): Number of queries per forward pass, defaults to `self.batch_size`.
+
+        Returns:
+            List[str]: 'yes' or 'no' for every query.
+        """
+        return ["yes" if p >= threshold else "no" for p in self.score_batch(user_inputs, batch_size)]
+
+    def calibrate(self, examples: List[Tuple[str, bool]], iterations: int = 50) -> Tuple[float, float]:
+        """
+        Fits Platt scaling of the logit margin on labelled queries, by Newton's method on the log loss.
+        The examples should not be the few-shot examples of the prompt, which the model sees as solved.
+
+        Args:
+            examples (List[Tuple[str, bool]]): (query, needs_ir) pairs, e.g. LLM-labelled traffic.
+            iterations (int): Maximum number of Newton steps.
+
+        Returns:
+            Tuple[float, float]: The fitted scale and bias.
+        """
+        margins = self.margins([query for query, _ in examples]).astype(np.float64)
+        labels = np.array([needs_ir for _, needs_ir in examples], dtype=np.float64)
+        features = np.stack([margins, np.ones_like(margins)], axis=1)
+
+        params = np.array([1.0, 0.0])
+        for _ in range(iterations):
+            probabilities = 1.0 / (1.0 + np.exp(-features @ params))
+            gradient = features.T @ (probabilities - labels)
+            hessian = (features * (probabilities * (1 - probabilities))[:, None]).T @ features + 1e-3 * np.eye(2)
+            step = np.linalg.solve(hessian, gradient)
+            params -= step
+            if np.abs(step).max() < 1e-6:
+                break
+
+        self.calibration = (float(params[0]), float(params[1]))
+        return self.calibration
@@ -0,0 +1,198 @@
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.chatbot.routing import IR_INTENT_EXAMPLES
+from models.huggingface.embedding import TextEmbedder
+
+
+def load_labelled_traffic(path: str) -> List[Tuple[str, bool]]:
+    """
+    Reads the IR decisions the LLM made on logged traffic, as written by `IntentRouter`.
+
+    Parameters:
+        path (str): Path of the JSONL decision log.
+
+    Returns:
+        List[Tuple[str, bool]]: (question, needs_ir) pairs, empty if the log does not exist.
+    """
+    if not path or not os.path.exists(path):
+        return []
+
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                examples.append((record["question"], bool(record["needs_ir"])))
+            except (ValueError, KeyError) as e:
+                print(f"Skipping malformed intent log record: {e}")
+    return examples
+
+
+class IntentRouter:
+    def __init__(self, embedder: TextEmbedder, examples: Iterable[Tuple[str, bool]] = IR_INTENT_EXAMPLES,
+                 threshold: float = 0.75, log_path: Optional[str] = None, shadow_rate: float = 0.0):
+        """
+        Nearest-centroid IR intent classifier on top of the retriever's embedding model.
+
+        Questions are embedded and compared with the mean embedding of the labelled "needs IR" and
+        "no IR" examples. The difference of the two cosine similarities, scaled by its typical size on
+        the training examples, gives the probability that IR is needed. Below `threshold` confidence the
+        caller's LLM decision is used instead, and its label is appended to `log_path` and folded into
+        the centroids, so the router learns from the traffic it is unsure about.
+
+        Parameters:
+            embedder (TextEmbedder): The already loaded embedding model.
+            examples (Iterable[Tuple[str, bool]]): Labelled (question, needs_ir) seed examples.
+            threshold (float): Minimum confidence, between 0.5 and 1, of a local decision.
+            log_path (Optional[str]): JSONL log of LLM decisions, also read as additional examples.
+            shadow_rate (float): Fraction of confident local decisions that are also sent to the LLM,
+                to measure the agreement rate.
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.log_path = log_path
+        self.shadow_rate = shadow_rate
+
+        self._lock = threading.Lock()
+        self.local_decisions = 0
+        self.llm_decisions = 0
+        self.compared = 0
+        self.agreed = 0
+        self.shadow_compared = 0
+        self.shadow_agreed = 0
+        self.decision_ms = 0.0
+
+        self.fit(list(examples) + load_labelled_traffic(log_path))
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.embedder.get_embedding(texts)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def fit(self, examples: List[Tuple[str, bool]]) -> None:
+        """
+        Computes the class centroids and the margin scale from labelled examples.
+
+        Parameters:
+            examples (List[Tuple[str, bool]]): (question, needs_ir) pairs, with both labels present.
+        """
+        labels = np.array([needs_ir for _, needs_ir in examples], dtype=bool)
+        if labels.all() or not labels.any():
+            raise ValueError("The intent router needs examples of both questions that need IR and that do not.")
+
+        vectors = self._embed([question for question, _ in examples])
+        self._sums = np.stack([vectors[~labels].sum(axis=0), vectors[labels].sum(axis=0)])
+        self._update_centroids()
+
+        margins = vectors @ (self._centroids[1] - self._centroids[0])
+        self.scale = max(float(np.median(np.abs(margins))), 1e-3)
+        print(f"Intent router fitted on {len(examples)} examples ({int(labels.sum())} needing IR).")
+
+    def _update_centroids(self):
+        self._centroids = self._sums / np.maximum(np.linalg.norm(self._sums, axis=1, keepdims=True), 1e-12)
+
+    def probability(self, question: str) -> float:
+        """
+        Returns the probability that the question needs information retrieval.
+
+        Parameters:
+            question (str): The user's question.
+
+        Returns:
+            float: The probability, 0.5 meaning the question is equally close to both centroids.
+        """
+        return self._probability(self._embed([question])[0])
+
+    def _probability(self, vector: np.ndarray) -> float:
+        margin = float(vector @ (self._centroids[1] - self._centroids[0]))
+        return float(1.0 / (1.0 + np.exp(-margin / self.scale)))
+
+    def decide(self, question: str, llm_decision: Callable[[str], bool]) -> bool:
+        """
+        Decides locally if the router is confident, otherwise asks the LLM and learns from its answer.
+
+        Parameters:
+            question (str): The user's question.
+            llm_decision (Callable[[str], bool]): The LLM classifier, e.g. `TechNewsChatbot.check_ir_needed`.
+
+        Returns:
+            bool: True if IR is needed, False otherwise.
+        """
+        started = time.perf_counter()
+        vector = self._embed([question])[0]
+        probability = self._probability(vector)
+        local = probability >= 0.5
+        confident = max(probability, 1.0 - probability) >= self.threshold
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"Intent router: P(IR) = {probability:.3f} in {elapsed_ms:.1f} ms, "
+              f"{'local decision' if confident else 'asking the LLM'}")
+
+        with self._lock:
+            self.decision_ms += elapsed_ms
+            if confident:
+                self.local_decisions += 1
+            else:
+                self.llm_decisions += 1
+
+        if confident and random.random() >= self.shadow_rate:
+            return local
+
+        decision = llm_decision(question)
+        self.record(question, decision, agreed=local == decision, shadow=confident, vector=vector)
+        return local if confident else decision
+
+    def record(self, question: str, needs_ir: bool, agreed: Optional[bool] = None, shadow: bool = False,
+               vector: Optional[np.ndarray] = None) -> None:
+        """
+        Adds an LLM-labelled question to the centroids and the decision log.
+
+        Parameters:
+            question (str): The user's question.
+            needs_ir (bool): The LLM decision.
+            agreed (Optional[bool]): Whether the local prediction matched the LLM decision.
+            shadow (bool): Whether the local prediction was confident, i.e. the LLM was only asked to compare.
+            vector (Optional[np.ndarray]): The normalized question embedding, if already computed.
+        """
+        if vector is None:
+            vector = self._embed([question])[0]
+        with self._lock:
+            self._sums[int(needs_ir)] += vector
+            self._update_centroids()
+            if agreed is not None:
+                self.compared += 1
+                self.agreed += int(agreed)
+                if shadow:
+                    self.shadow_compared += 1
+                    self.shadow_agreed += int(agreed)
+
+            if self.log_path:
+                record = {"timestamp": datetime.now().isoformat(), "question": question, "needs_ir": needs_ir}
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f"Failed to write intent log: {e}")
+
+    def stats(self) -> dict:
+        """
+        Returns the share of local decisions, the mean decision time and the agreement rate with the LLM,
+        over all compared questions and over the confident (shadowed) ones alone.
+        """
+        with self._lock:
+            decisions = self.local_decisions + self.llm_decisions
+            return {
+                "decisions": decisions,
+                "local_share": self.local_decisions / decisions if decisions else 0.0,
+                "llm_decisions": self.llm_decisions,
+                "compared": self.compared,
+                "agreement": self.agreed / self.compared if self.compared else None,
+                "confident_agreement": self.shadow_agreed / self.shadow_compared if self.shadow_compared else None,
+                "mean_decision_ms": self.decision_ms / decisions if decisions else 0.0
+            }
@@ -58,6 +58,29 @@ class PromptManager:
         )
         return PromptTemplate(input_variables=["question"], template=template)
 
+    def get_routing_template(self) -> PromptTemplate:
+        """
+        Returns a template for the single-call router, which decides if information retrieval is needed
+        and writes the search query and filters in the same call.
+
+        Returns:
+            PromptTemplate: The template for structured routing.
+        """
+        template = (
+            "You are a specialized assistant for technology news, particularly recent advancements and industry updates.\n\n"
+            "Decide how to answer the user's latest question:\n"
+            "- needs_ir: true if it is about recent events, releases, or updates in technology; false for general "
+            "technical knowledge that does not need updates, and for unrelated topics (e.g., politics or entertainment).\n"
+            "- search_query: if needs_ir is true, a concise and clear search query for technology news articles that "
+            "captures the user's intent, using the conversation to resolve references. Leave time expressions out.\n"
+            "- recency_days: if the question is limited to a period (today, this week, the past 3 days, ...), "
+            "the number of days it covers, otherwise null.\n"
+            "- topics: only if the question is explicitly about one of the listed news topics, otherwise empty.\n\n"
+            "Conversation:\n{conversation}\n\n"
+            "User's question:\n{question}"
+        )
+        return PromptTemplate(input_variables=["conversation", "question"], template=template)
+
     def get_ir_query_template(self) -> PromptTemplate:
         """
         Returns a template for generating the IR query dynamically.
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from app.ir_system.query_filters import NEWS_TOPICS, SearchFilters, parse_query_filters
+
+ROUTING_MODES = ("multi_call", "structured", "embedding")
+
+# Labelled IR decisions: the few-shot examples of the local classifier prompt and the seed set of the intent router.
+IR_INTENT_EXAMPLES = [
+    ("What are the latest updates in AI research?", True),
+    ("Explain how neural networks work.", False),
+    ("What happened last week in cybersecurity?", True),
+    ("Define blockchain technology.", False),
+    ("Any news on the latest iPhone release?", True),
+    ("How does a quantum computer work?", False),
+    ("What’s trending in tech this month?", True),
+    ("Describe the process of software development.", False),
+    ("Recent advancements in self-driving cars?", True),
+    ("What is the meaning of IoT?", False),
+    ("Can you give me the latest trends in renewable energy?", False),
+    ("What’s new in the world of quantum computing?", True),
+    ("How do I bake a cake?", False),
+    ("Any breaking news on cybersecurity threats?", True),
+    ("Tell me about the latest developments in AI ethics.", True)
+]
+
+
+class RoutingDecision(BaseModel):
+    """Everything the chatbot needs before retrieval, returned by one structured-output LLM call."""
+    needs_ir: bool = Field(
+        description="True if answering requires recent or time-sensitive technology news, false otherwise."
+    )
+    search_query: str = Field(
+        default="",
+        description="A concise search query for the news index capturing the user's intent, resolved against "
+                    "the conversation and without time expressions. Empty when needs_ir is false."
+    )
+    recency_days: Optional[int] = Field(
+        default=None,
+        description="How many days back the question is limited to, e.g. 1 for today, 7 for this week or "
+                    "last week, 30 for this month. Null when the question is not time-bounded."
+    )
+    topics: List[Literal[tuple(NEWS_TOPICS)]] = Field(
+        default_factory=list,
+        description="News topics the question is explicitly restricted to. Empty unless clearly applicable."
+    )
+
+    def filters(self, now: Optional[datetime] = None, question: Optional[str] = None) -> Optional[SearchFilters]:
+        """
+        Converts the recency and topics into search filters, None if the search is unrestricted.
+
+        Parameters:
+            now (Optional[datetime]): Reference time, the current UTC time by default.
+            question (Optional[str]): The user's question. A time expression in it is resolved with the
+                rules of `parse_query_filters` ("this week" starts on Monday) instead of `recency_days`,
+                so both routing modes, and speculative retrievals, filter such questions identically.
+
+        Returns:
+            Optional[SearchFilters]: The filters, None if the search is unrestricted.
+        """
+        now = now or datetime.now(timezone.utc)
+        since, until = None, None
+        question_filters = parse_query_filters(question, now)[1] if question else None
+        if question_filters is not None:
+            since, until = question_filters.since, question_filters.until
+        elif self.recency_days:
+            since = now - timedelta(days=self.recency_days)
+        filters = SearchFilters(since=since, until=until, topics=tuple(self.topics))
+        return filters or None
@@ -0,0 +1,223 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from app.ir_system.query_cache import normalize_query
+from app.ir_system.query_filters import SearchFilters, parse_query_filters
+
+
+class SpeculativeRetriever:
+    def __init__(self, retriever, max_workers: int = 8, similarity_threshold: float = 0.9,
+                 rewrite_deadline: Optional[float] = None, speculate_previous: bool = True, rewrite_workers: int = 4):
+        """
+        Starts retrievals for a question before the chatbot knows whether, and with which query, it will
+        search, and keeps the speculation metrics of every chatbot sharing it.
+
+        Parameters:
+            retriever: The information retriever instance.
+            max_workers (int): Threads running speculative retrievals.
+            similarity_threshold (float): Minimum cosine similarity between the rewritten query and a
+                speculative query for the speculative results to be used.
+            rewrite_deadline (Optional[float]): Seconds to wait for the query rewrite, from the moment it starts
+                running, before using the results of the raw question instead, no deadline when None.
+            speculate_previous (bool): Also retrieve for the previous IR query of the conversation.
+            rewrite_workers (int): Threads running query rewrites under a deadline, separate from the
+                retrieval threads so a rewrite never queues behind other sessions' speculative retrievals.
+        """
+        self.retriever = retriever
+        self.similarity_threshold = similarity_threshold
+        self.rewrite_deadline = rewrite_deadline
+        self.speculate_previous = speculate_previous
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-retrieval")
+        self.rewrite_executor = ThreadPoolExecutor(max_workers=rewrite_workers, thread_name_prefix="query-rewrite")
+
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.late_rewrites = 0
+        self.saved_ms = 0.0
+        self.wasted_ms = 0.0
+
+    def start(self, question: str, retrieve: Callable[[str, str, Optional[SearchFilters]], List[Document]],
+              previous_query: Optional[str] = None) -> "Speculation":
+        """
+        Submits the speculative retrievals of a question.
+
+        Parameters:
+            question (str): The user's question.
+            retrieve (Callable): Runs a search for (ir_query, search_query, filters), e.g. `TechNewsChatbot.retrieve`.
+            previous_query (Optional[str]): The IR query of the previous question in the conversation.
+
+        Returns:
+            Speculation: The handle the chatbot resolves once routing is done.
+        """
+        queries = [question]
+        if self.speculate_previous and previous_query and normalize_query(previous_query) != normalize_query(question):
+            queries.append(previous_query)
+        return Speculation(self, queries, retrieve)
+
+    def record(self, started: int = 0, hits: int = 0, misses: int = 0, discarded: int = 0, late_rewrites: int = 0,
+               saved_ms: float = 0.0, wasted_ms: float = 0.0) -> None:
+        with self._lock:
+            self.started += started
+            self.hits += hits
+            self.misses += misses
+            self.discarded += discarded
+            self.late_rewrites += late_rewrites
+            self.saved_ms += saved_ms
+            self.wasted_ms += wasted_ms
+
+    def stats(self) -> dict:
+        """
+        Returns the speculation hit rate among IR questions, the share of speculations discarded because
+        no IR was needed, and the retrieval latency saved by hits and spent on unused speculations.
+        """
+        with self._lock:
+            resolved = self.hits + self.misses
+            return {
+                "speculations": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / resolved if resolved else 0.0,
+                "discarded": self.discarded,
+                "late_rewrites": self.late_rewrites,
+                "saved_ms": self.saved_ms,
+                "mean_saved_ms": self.saved_ms / self.hits if self.hits else 0.0,
+                "wasted_ms": self.wasted_ms
+            }
+
+
+class Speculation:
+    def __init__(self, speculator: SpeculativeRetriever, queries: List[str],
+                 retrieve: Callable[[str, str, Optional[SearchFilters]], List[Document]]):
+        """
+        The speculative retrievals of one question. Time expressions are resolved against the start of the
+        speculation, so the filters of a matching rewrite compare equal to the speculative ones.
+
+        Parameters:
+            speculator (SpeculativeRetriever): The shared speculator.
+            queries (List[str]): Queries to retrieve for, the raw question first.
+            retrieve (Callable): Runs a search for (ir_query, search_query, filters).
+        """
+        self.speculator = speculator
+        self.now = datetime.now(timezone.utc)
+        self.futures: Dict[str, Tuple[str, Optional[SearchFilters], Future]] = {}
+
+        for query in queries:
+            search_query, filters = parse_query_filters(query, self.now)
+            future = speculator.executor.submit(self._timed, retrieve, query, search_query, filters)
+            self.futures[query] = (search_query, filters, future)
+        speculator.record(started=len(self.futures))
+
+    @staticmethod
+    def _timed(retrieve, query, search_query, filters) -> Tuple[List[Document], float, float]:
+        started = time.perf_counter()
+        documents = retrieve(query, search_query, filters)
+        finished = time.perf_counter()
+        return documents, finished - started, finished
+
+    def rewrite(self, generate: Callable[[], str]) -> Optional[str]:
+        """
+        Runs the query rewrite, waiting at most for the speculator's deadline once the rewrite has started.
+
+        Parameters:
+            generate (Callable[[], str]): Writes the IR query, e.g. a call of `TechNewsChatbot.generate_ir_query`.
+
+        Returns:
+            Optional[str]: The IR query, or None if the rewrite missed the deadline. Its late result is dropped.
+        """
+        if self.speculator.rewrite_deadline is None:
+            return generate()
+
+        running = threading.Event()
+
+        def run() -> str:
+            running.set()
+            return generate()
+
+        future = self.speculator.rewrite_executor.submit(run)
+        try:
+            # Time spent queued for a rewrite thread does not count against the deadline.
+            running.wait()
+            return future.result(timeout=self.speculator.rewrite_deadline)
+        except TimeoutError:
+            print(f"Query rewrite missed the {self.speculator.rewrite_deadline:.1f}s deadline, "
+                  f"using the speculative retrieval of the question.")
+            self.speculator.record(late_rewrites=1)
+            return None
+
+    def _similarity(self, first: str, second: str) -> float:
+        if normalize_query(first) == normalize_query(second):
+            return 1.0
+        vectors = np.asarray(self.speculator.retriever.vectorize_queries([first, second]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        return float(vectors[0] @ vectors[1] / max(norms[0] * norms[1], 1e-12))
+
+    def resolve(self, search_query: str, filters: Optional[SearchFilters]) -> Optional[List[Document]]:
+        """
+        Returns the results of the closest speculative retrieval if it searched with the same filters
+        and a query similar enough to the final one, and discards the others.
+
+        Parameters:
+            search_query (str): The final search query, without its time expression.
+            filters (Optional[SearchFilters]): The final filters, parsed against `self.now`.
+
+        Returns:
+            Optional[List[Document]]: The speculative documents, or None if the chatbot has to retrieve.
+        """
+        candidates = [
+            (self._similarity(search_query, speculative_query), query)
+            for query, (speculative_query, speculative_filters, _) in self.futures.items()
+            if speculative_filters == filters
+        ]
+        similarity, query = max(candidates, default=(0.0, None))
+        print(f"Speculative retrieval: best similarity {similarity:.3f} ('{query}')")
+
+        documents = None
+        if query is not None and similarity >= self.speculator.similarity_threshold:
+            documents = self._take(query)
+        if documents is None:
+            self.speculator.record(misses=1)
+        self.discard()
+        return documents
+
+    def _take(self, query: str) -> Optional[List[Document]]:
+        _, _, future = self.futures.pop(query)
+        requested = time.perf_counter()
+        try:
+            documents, duration, finished = future.result()
+        except Exception as e:
+            print(f"Speculative retrieval failed: {e}")
+            return None
+
+        # The retrieval time the answer did not wait for, the whole retrieval if it finished before the request.
+        saved_ms = min(duration, max(0.0, requested - (finished - duration))) * 1000
+        self.speculator.record(hits=1, saved_ms=saved_ms)
+        return documents
+
+    def discard(self, not_needed: bool = False) -> None:
+        """
+        Cancels the speculative retrievals that have not started and drops the results of the others.
+        Does nothing once the speculation was resolved or discarded, so it is safe to call on every exit path.
+
+        Parameters:
+            not_needed (bool): The question turned out not to need IR at all.
+        """
+        if not self.futures:
+            return
+        for _, _, future in self.futures.values():
+            if not future.cancel():
+                future.add_done_callback(self._record_wasted)
+        self.speculator.record(discarded=int(not_needed))
+        self.futures.clear()
+
+    def _record_wasted(self, future: Future) -> None:
+        if future.exception() is None:
+            self.speculator.record(wasted_ms=future.result()[1] * 1000)
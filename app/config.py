@@ -6,20 +6,52 @@ from pathlib import Path
 env_path = Path(__file__).resolve().parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+# Retriever backend: "elasticsearch", or "local" for the memory-mapped store in LOCAL_STORE_PATH
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "elasticsearch")
+LOCAL_STORE_PATH = os.getenv("LOCAL_STORE_PATH", "local_store")
+
 # Elasticsearch setup
 ES_HOST = os.getenv("ES_HOST")
-ES_PORT = int(os.getenv("ES_PORT"))
+ES_PORT = int(os.getenv("ES_PORT", 9200))
 ES_USER = os.getenv("ES_USER")
 ES_PASSWORD = os.getenv("ES_PASSWORD")
+ES_INDEX_ALIAS = os.getenv("ES_INDEX_ALIAS", "tech_news")
+SEARCH_STRATEGY = os.getenv("SEARCH_STRATEGY", "legacy")
+MAX_CONTENT_CHARS = int(os.getenv("MAX_CONTENT_CHARS", 0)) or None
+RESCORE_CANDIDATE_POOL = int(os.getenv("RESCORE_CANDIDATE_POOL", 100))
+RESCORE_VECTOR_WEIGHT = float(os.getenv("RESCORE_VECTOR_WEIGHT", 0.5))
 
 # Hugging Face setup
 HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 HF_LLM_MODEL = os.getenv("HF_LLM_MODEL")
 HF_EMBEDDING_MODEL = os.getenv("HF_EMBEDDING_MODEL")
 
+# Retriever caches
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+# 0 means no TTL
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", 0)) or None
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 1024))
+RESULT_CACHE_CHECK_SECONDS = float(os.getenv("RESULT_CACHE_CHECK_SECONDS", 0))
+ETL_STATE_INDEX = os.getenv("ETL_STATE_INDEX", "etl_state")
+
+# Retrieval log
+RETRIEVAL_LOG_PATH = os.getenv("RETRIEVAL_LOG_PATH", "retriever_log.jsonl")
+RETRIEVAL_LOG_SAMPLE_RATE = float(os.getenv("RETRIEVAL_LOG_SAMPLE_RATE", 1.0))
+
 # OpenAI setup
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Chatbot routing: "multi_call", "structured" or "embedding"
+ROUTING_MODE = os.getenv("ROUTING_MODE", "multi_call")
+INTENT_ROUTER_THRESHOLD = float(os.getenv("INTENT_ROUTER_THRESHOLD", 0.75))
+INTENT_ROUTER_SHADOW_RATE = float(os.getenv("INTENT_ROUTER_SHADOW_RATE", 0.0))
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH", "intent_log.jsonl")
+
+# Speculative retrieval, started in parallel with routing
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+SPECULATION_SIMILARITY = float(os.getenv("SPECULATION_SIMILARITY", 0.9))
+SPECULATION_REWRITE_DEADLINE_SECONDS = float(os.getenv("SPECULATION_REWRITE_DEADLINE_SECONDS", 0)) or None
+
 # SQLite database setup
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'database', 'chat_history.db')}"
@@ -0,0 +1,454 @@
+"""
+Benchmarks of the retriever's search strategies against a live index.
+
+Run with `python -m app.ir_system.benchmark [strategy ...]` to compare strategies,
+`python -m app.ir_system.benchmark projection [top_k ...]` to compare response payloads,
+`python -m app.ir_system.benchmark batch` to compare a search loop with one multi-search,
+`python -m app.ir_system.benchmark rescore` to sweep the candidate pool and blend weight of "bm25_rescore",
+`python -m app.ir_system.benchmark filters` to compare time-bounded queries with and without date pre-filters,
+or `python -m app.ir_system.benchmark concurrency [searches]` to run async searches against a stand-in client.
+"""
+import asyncio
+import json
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.ir_system.query_filters import parse_query_filters
+from app.ir_system.retriver import InformationRetriever
+from app.ir_system.search_strategies import BM25RescoreStrategy, StrategyConfig
+
+DEFAULT_QUERIES = [
+    "latest AI news",
+    "Nvidia GPUs",
+    "new iPhone release",
+    "cybersecurity breach this week",
+    "Tesla electric vehicles sales",
+    "quantum computing breakthrough",
+    "Microsoft Windows update",
+    "OpenAI GPT model launch",
+    "cryptocurrency regulation",
+    "Meta virtual reality headset",
+    "Google antitrust ruling",
+    "self-driving cars safety",
+    "5G network rollout",
+    "Amazon cloud computing outage",
+    "TikTok ban"
+]
+
+TIME_BOUNDED_QUERIES = [
+    "cybersecurity news this week",
+    "AI announcements in the past 3 days",
+    "Nvidia stock yesterday",
+    "cryptocurrency regulation over the last week",
+    "cloud outages today",
+    "quantum computing in the past two days",
+    "Apple product launches this month",
+    "data breaches in the last 48 hours"
+]
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+def _overlap(results: List[List[str]], baseline: List[List[str]]) -> float:
+    """Mean fraction of the baseline's ids that a strategy also returns, a label-free proxy for quality."""
+    scores = [len(set(ids) & set(base)) / len(base) for ids, base in zip(results, baseline) if base]
+    return statistics.mean(scores) if scores else 0.0
+
+
+def benchmark_strategies(retriever: InformationRetriever, queries: List[str] = DEFAULT_QUERIES, top_k: int = 10,
+                         strategies: Optional[List[str]] = None, repeats: int = 3,
+                         baseline: str = "legacy") -> Dict[str, dict]:
+    """
+    Measures the latency of each search strategy and the overlap of its results with the baseline strategy.
+
+    Every query is searched once before timing, so query embeddings are cached and the measured
+    latency is the Elasticsearch round trip plus result conversion.
+
+    Parameters:
+        retriever (InformationRetriever): The retriever to benchmark.
+        queries (List[str]): Queries to run.
+        top_k (int): Number of documents requested per query.
+        strategies (Optional[List[str]]): Strategies to compare, all registered strategies by default.
+        repeats (int): Number of timed runs of every query.
+        baseline (str): Strategy the overlap is computed against.
+
+    Returns:
+        Dict[str, dict]: Latency percentiles (ms) and overlap@k per strategy.
+    """
+    strategies = strategies or list(retriever.strategies)
+    if baseline not in strategies:
+        strategies = [baseline] + strategies
+
+    ids = {}
+    report = {}
+    for strategy in strategies:
+        ids[strategy] = [
+            [doc.metadata["id"] for doc in result.documents]
+            for result in retriever.search_many(queries, top_k=top_k, strategy=strategy)
+        ]
+
+        latencies = []
+        for _ in range(repeats):
+            for query in queries:
+                started = time.perf_counter()
+                retriever.search(query, top_k=top_k, strategy=strategy)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        report[strategy] = {
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "mean_ms": statistics.mean(latencies),
+            f"overlap@{top_k}": _overlap(ids[strategy], ids[baseline])
+        }
+
+    return report
+
+
+def benchmark_filters(retriever: InformationRetriever, queries: List[str] = TIME_BOUNDED_QUERIES, top_k: int = 10,
+                      repeats: int = 3) -> Dict[str, dict]:
+    """
+    Compares searching time-bounded queries as they are with searching them with the time expression
+    parsed into a date pre-filter.
+
+    Returns:
+        Dict[str, dict]: Latency percentiles (ms) and the mean fraction of results published inside the
+        time range the query asks for, per mode.
+    """
+    parsed = [(query, *parse_query_filters(query)) for query in queries]
+    parsed = [(query, search_query, filters) for query, search_query, filters in parsed if filters]
+
+    def in_range(documents, filters) -> float:
+        if not documents:
+            return 0.0
+        since = filters.since.strftime("%Y-%m-%dT%H:%M:%SZ") if filters.since else ""
+        until = filters.until.strftime("%Y-%m-%dT%H:%M:%SZ") if filters.until else "9999"
+        return statistics.mean(since <= (doc.metadata.get("publishedAt") or "") < until for doc in documents)
+
+    report = {}
+    for mode in ("unfiltered", "filtered"):
+        latencies = []
+        precision = []
+        for _ in range(repeats):
+            for query, search_query, filters in parsed:
+                started = time.perf_counter()
+                if mode == "filtered":
+                    documents = retriever.search(search_query, top_k=top_k, filters=filters)
+                else:
+                    documents = retriever.search(query, top_k=top_k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                precision.append(in_range(documents, filters))
+
+        report[mode] = {"p50_ms": _percentile(latencies, 50), "p95_ms": _percentile(latencies, 95),
+                        "in_range": statistics.mean(precision)}
+    return report
+
+
+def benchmark_rescore(retriever: InformationRetriever, queries: List[str] = DEFAULT_QUERIES, top_k: int = 10,
+                     candidate_pools: List[int] = (50, 100, 200), vector_weights: List[float] = (0.3, 0.5, 0.7),
+                     repeats: int = 3, baseline: str = "legacy") -> Dict[str, dict]:
+    """
+    Runs `benchmark_strategies` over a grid of "bm25_rescore" configurations against the baseline
+    three-kNN query, to pick the candidate pool and blend weight.
+
+    Returns:
+        Dict[str, dict]: Latency percentiles (ms) and overlap@k of the baseline and of every configuration.
+    """
+    strategies = dict(retriever.strategies)
+    try:
+        for candidate_pool in candidate_pools:
+            for vector_weight in vector_weights:
+                retriever.strategies[f"rescore_{candidate_pool}_{vector_weight}"] = BM25RescoreStrategy(
+                    StrategyConfig(vector_fields={"doc_vector": 1}, candidate_pool=candidate_pool,
+                                   vector_weight=vector_weight)
+                )
+        candidates = [name for name in retriever.strategies if name.startswith("rescore_")]
+        return benchmark_strategies(retriever, queries, top_k=top_k, strategies=[baseline] + candidates,
+                                    repeats=repeats, baseline=baseline)
+    finally:
+        retriever.strategies = strategies
+
+
+def _payload(retriever: InformationRetriever, body: dict) -> dict:
+    """Runs one search and measures the round trip, the size of the response and the time to decode it."""
+    started = time.perf_counter()
+    response = retriever.es_client.search(index=retriever.index_name, body=body)
+    round_trip = time.perf_counter() - started
+
+    raw = json.dumps(response.body).encode("utf-8")
+    started = time.perf_counter()
+    json.loads(raw)
+    decode = time.perf_counter() - started
+    return {"bytes": len(raw), "decode_ms": decode * 1000, "round_trip_ms": round_trip * 1000}
+
+
+def benchmark_projection(retriever: InformationRetriever, queries: List[str] = DEFAULT_QUERIES,
+                         top_k_values: List[int] = (10, 50, 100), strategy: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Compares the response of the full `_source` with the lean projection the retriever requests,
+    with and without server-side content truncation.
+
+    The response is re-encoded to measure its size and decode time, so the numbers reflect the JSON
+    the client parses rather than the compressed bytes on the wire.
+
+    Parameters:
+        retriever (InformationRetriever): The retriever to benchmark.
+        queries (List[str]): Queries to run.
+        top_k_values (List[int]): Result sizes to compare.
+        strategy (Optional[str]): Search strategy, defaults to the retriever's.
+
+    Returns:
+        Dict[str, dict]: Mean response size (KB), decode time (ms) and round trip (ms) per projection and top_k.
+    """
+    search_strategy = retriever.strategies[strategy or retriever.strategy]
+    max_content_chars = retriever.max_content_chars
+    vectors = {query: retriever.vectorize_query(query) for query in queries}
+
+    report = {}
+    try:
+        for top_k in top_k_values:
+            for projection in ("full", "lean", "truncated"):
+                retriever.max_content_chars = (max_content_chars or 1000) if projection == "truncated" else None
+                payloads = []
+                for query in queries:
+                    body = retriever.build_search_body(search_strategy, query, vectors[query], top_k)
+                    if projection == "full":
+                        body.pop("_source")
+                    payloads.append(_payload(retriever, body))
+
+                report[f"{projection}@{top_k}"] = {
+                    "kb": statistics.mean(payload["bytes"] for payload in payloads) / 1024,
+                    "decode_ms": statistics.mean(payload["decode_ms"] for payload in payloads),
+                    "round_trip_ms": statistics.mean(payload["round_trip_ms"] for payload in payloads)
+                }
+    finally:
+        retriever.max_content_chars = max_content_chars
+
+    return report
+
+
+def benchmark_search_many(retriever: InformationRetriever, queries: List[str] = DEFAULT_QUERIES, top_k: int = 10,
+                          repeats: int = 3) -> Dict[str, dict]:
+    """
+    Compares searching the queries one by one with a single `search_many` call.
+
+    The first run of each mode starts with an empty query cache, so unless the persistent embedding cache
+    already holds the queries it includes embedding them, one forward pass per query against one batched
+    pass. The following runs measure only the round trips.
+
+    Parameters:
+        retriever (InformationRetriever): The retriever to benchmark.
+        queries (List[str]): Queries to run.
+        top_k (int): Number of documents requested per query.
+        repeats (int): Number of warm runs of each mode.
+
+    Returns:
+        Dict[str, dict]: Cold and mean warm wall time (ms) and failed queries per mode.
+    """
+    def run_loop():
+        return [retriever.search(query, top_k=top_k) for query in queries], 0
+
+    def run_batch():
+        results = retriever.search_many(queries, top_k=top_k)
+        return results, sum(result.error is not None for result in results)
+
+    report = {}
+    for mode, run in (("loop", run_loop), ("search_many", run_batch)):
+        if retriever.query_cache is not None:
+            retriever.query_cache.clear()
+
+        timings = []
+        failed = 0
+        for _ in range(repeats + 1):
+            started = time.perf_counter()
+            _, failed = run()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        report[mode] = {"cold_ms": timings[0], "warm_ms": statistics.mean(timings[1:]), "failed": failed}
+
+    return report
+
+
+class StandInAsyncElasticsearch:
+    """Local stand-in for AsyncElasticsearch that answers every search after a fixed latency."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def search(self, index: str, body: dict) -> dict:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return {"hits": {"hits": [
+            {"_id": f"{index}-{rank}", "_score": 1 / (rank + 1), "_source": {"title": f"Article {rank}"}}
+            for rank in range(body.get("size", 10))
+        ]}}
+
+    async def close(self) -> None:
+        pass
+
+
+async def _heartbeat(interval: float, lags: List[float]) -> None:
+    """Wakes up every `interval` seconds and records how late each wake-up was, i.e. how long the loop was blocked."""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _measure(run: Callable[[], Awaitable], stand_in: StandInAsyncElasticsearch) -> Tuple[object, dict]:
+    stand_in.max_in_flight = 0
+    lags = []
+    heartbeat = asyncio.create_task(_heartbeat(stand_in.latency / 10, lags))
+    started = time.perf_counter()
+    try:
+        result = await run()
+    finally:
+        wall_ms = (time.perf_counter() - started) * 1000
+        heartbeat.cancel()
+    return result, {"wall_ms": wall_ms, "max_in_flight": stand_in.max_in_flight,
+                    "max_loop_lag_ms": max(lags, default=0.0) * 1000}
+
+
+async def _run_concurrency(retriever: InformationRetriever, stand_in: StandInAsyncElasticsearch,
+                           queries: List[str], searches: int) -> Dict[str, dict]:
+    report = {}
+
+    async def sequential():
+        for query in queries:
+            await retriever.asearch(query)
+
+    _, report["sequential"] = await _measure(sequential, stand_in)
+    report["sequential"].update(searches=len(queries), timeouts=0, still_in_flight=stand_in.in_flight)
+
+    async def concurrent():
+        return await asyncio.gather(*(retriever.asearch(queries[i % len(queries)]) for i in range(searches)))
+
+    _, report["concurrent"] = await _measure(concurrent, stand_in)
+    report["concurrent"].update(searches=searches, timeouts=0, still_in_flight=stand_in.in_flight)
+
+    async def timed_out():
+        return await asyncio.gather(
+            *(retriever.asearch(queries[i % len(queries)], timeout=stand_in.latency / 2) for i in range(searches)),
+            return_exceptions=True
+        )
+
+    results, report["timed_out"] = await _measure(timed_out, stand_in)
+    report["timed_out"].update(searches=searches,
+                               timeouts=sum(isinstance(result, asyncio.TimeoutError) for result in results),
+                               still_in_flight=stand_in.in_flight)
+    return report
+
+
+def check_concurrency(report: Dict[str, dict], latency: float) -> None:
+    """
+    Fails when the report of `benchmark_concurrency` shows that `asearch` blocks the event loop,
+    does not overlap searches, or ignores its timeout or the cancellation of its request.
+
+    Parameters:
+        report (Dict[str, dict]): The report to check.
+        latency (float): The simulated Elasticsearch latency of the run, in seconds.
+
+    Raises:
+        AssertionError: With every failed check.
+    """
+    latency_ms = latency * 1000
+    concurrent, timed_out = report["concurrent"], report["timed_out"]
+    failures = []
+
+    for name, row in report.items():
+        if row["max_loop_lag_ms"] > latency_ms:
+            failures.append(f"{name}: the event loop was blocked for {row['max_loop_lag_ms']:.1f} ms, "
+                            f"longer than one {latency_ms:.0f} ms search")
+        if row["still_in_flight"]:
+            failures.append(f"{name}: {row['still_in_flight']} requests were still in flight after the run")
+
+    if concurrent["searches"] > 1 and concurrent["max_in_flight"] < 2:
+        failures.append("concurrent: searches ran one at a time")
+    if concurrent["wall_ms"] > concurrent["searches"] * latency_ms / 2:
+        failures.append(f"concurrent: {concurrent['searches']} searches took {concurrent['wall_ms']:.0f} ms, "
+                        f"more than half of running them one after another")
+
+    if timed_out["timeouts"] != timed_out["searches"]:
+        failures.append(f"timed_out: only {timed_out['timeouts']} of {timed_out['searches']} searches timed out")
+    if timed_out["wall_ms"] >= latency_ms:
+        failures.append(f"timed_out: the batch took {timed_out['wall_ms']:.0f} ms, "
+                        f"the timeout of {latency_ms / 2:.0f} ms did not cancel the requests")
+
+    if failures:
+        raise AssertionError("asearch concurrency check failed:\n  " + "\n  ".join(failures))
+
+
+def benchmark_concurrency(retriever: InformationRetriever, queries: List[str] = DEFAULT_QUERIES,
+                          searches: int = 200, latency: float = 0.05, check: bool = True) -> Dict[str, dict]:
+    """
+    Shows that async searches overlap on one event loop, using a stand-in client instead of a live cluster.
+
+    Runs the queries one after another, then `searches` of them concurrently, then the same concurrent
+    batch with a timeout shorter than the stand-in latency, which must cancel every request in flight.
+    A heartbeat task measures how long the event loop is blocked during each run. Query embeddings are
+    computed beforehand, so the wall time is dominated by the simulated round trips.
+
+    Parameters:
+        retriever (InformationRetriever): The retriever whose async client is temporarily replaced.
+        queries (List[str]): Queries to run.
+        searches (int): Number of concurrent searches.
+        latency (float): Simulated Elasticsearch latency in seconds.
+        check (bool): Run `check_concurrency` on the report, raising an AssertionError if a check fails.
+
+    Returns:
+        Dict[str, dict]: Wall time (ms), peak searches in flight, longest event loop block (ms), timeouts
+        and requests left in flight per run.
+    """
+    async_es_client, retrieval_logger = retriever.async_es_client, retriever.retrieval_logger
+    stand_in = StandInAsyncElasticsearch(latency=latency)
+    for query in queries:
+        retriever.vectorize_query(query)
+
+    retriever.async_es_client, retriever.retrieval_logger = stand_in, None
+    try:
+        report = asyncio.run(_run_concurrency(retriever, stand_in, queries, searches))
+    finally:
+        retriever.async_es_client, retriever.retrieval_logger = async_es_client, retrieval_logger
+
+    if check:
+        check_concurrency(report, latency)
+    return report
+
+
+def print_report(report: Dict[str, dict]) -> None:
+    columns = list(next(iter(report.values())).keys())
+    print(f"{'':<16}" + "".join(f"{column:>14}" for column in columns))
+    for name, row in report.items():
+        print(f"{name:<16}" + "".join(f"{value:>14.3f}" for value in row.values()))
+
+
+if __name__ == "__main__":
+    from app.config import ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, ES_INDEX_ALIAS
+    from app.ir_system.system import get_retriever
+
+    # Without the result cache, so repeated searches measure Elasticsearch rather than cache hits.
+    benchmark_retriever = get_retriever(ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, index_name=ES_INDEX_ALIAS,
+                                        result_cache_size=0)
+    if sys.argv[1:2] == ["concurrency"]:
+        print_report(benchmark_concurrency(benchmark_retriever, searches=int(sys.argv[2]) if sys.argv[2:] else 200))
+    elif sys.argv[1:2] == ["filters"]:
+        print_report(benchmark_filters(benchmark_retriever))
+    elif sys.argv[1:2] == ["rescore"]:
+        print_report(benchmark_rescore(benchmark_retriever))
+    elif sys.argv[1:2] == ["batch"]:
+        print_report(benchmark_search_many(benchmark_retriever))
+    elif sys.argv[1:2] == ["projection"]:
+        top_k_values = [int(top_k) for top_k in sys.argv[2:]] or (10, 50, 100)
+        print_report(benchmark_projection(benchmark_retriever, top_k_values=top_k_values))
+    else:
+        print_report(benchmark_strategies(benchmark_retriever, strategies=sys.argv[1:] or None))
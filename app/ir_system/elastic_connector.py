@@ -1,4 +1,4 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 
 
 def connect_to_es(host: str, port: int, user: str, password: str) -> Elasticsearch:
@@ -19,3 +19,29 @@ def connect_to_es(host: str, port: int, user: str, password: str) -> Elasticsear
         basic_auth=(user, password),
         verify_certs=False
     )
+
+
+def connect_to_async_es(host: str, port: int, user: str, password: str,
+                        connections_per_node: int = 10) -> AsyncElasticsearch:
+    """
+    Connect to an Elasticsearch instance with the asyncio client.
+
+    The client keeps one aiohttp connection pool that every coroutine shares, so it should be
+    created once and used from a single event loop.
+
+    Parameters:
+        host (str): The Elasticsearch host.
+        port (int): The Elasticsearch port.
+        user (str): The Elasticsearch user.
+        password (str): The Elasticsearch password.
+        connections_per_node (int): Size of the connection pool, the number of requests in flight at once.
+
+    Returns:
+        AsyncElasticsearch: The asynchronous Elasticsearch client instance.
+    """
+    return AsyncElasticsearch(
+        hosts=[{"host": host, "port": port, "scheme": "https"}],
+        basic_auth=(user, password),
+        verify_certs=False,
+        connections_per_node=connections_per_node
+    )
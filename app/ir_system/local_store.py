@@ -0,0 +1,460 @@
+"""
+In-process, memory-mapped vector store, an alternative retriever backend to Elasticsearch for development,
+CI and small deployments.
+
+Build a store from an `export_index` dump with `python -m app.ir_system.local_store build <dump.ndjson> <store_dir>`,
+or from ETL output with `build_local_store`, and time it with `python -m app.ir_system.local_store bench <store_dir>`.
+"""
+import argparse
+import hashlib
+import json
+import re
+import statistics
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import numpy as np
+from elasticsearch import Elasticsearch
+from langchain.schema import Document
+from pydantic import Field, root_validator
+
+from app.ir_system.query_filters import SearchFilters
+from app.ir_system.retriver import InformationRetriever, SearchResult, SOURCE_FIELDS, hit_to_document
+
+VECTOR_FIELDS = ["title_vector", "description_vector", "content_vector"]
+TEXT_BOOSTS = {"title": 3, "description": 2, "content": 1}
+LOCAL_STRATEGIES = ("hybrid", "vector", "bm25")
+LABEL_FIELDS = ("topic", "source_name")
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-cases the text and splits it into word tokens, the analysis of the BM25 side."""
+    return _TOKEN.findall(text.casefold()) if text else []
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def document_vector(doc: dict) -> Optional[np.ndarray]:
+    """
+    Returns the unit vector a document is searched by: its `doc_vector`, or the normalised mean of its
+    normalised field vectors for documents indexed before `doc_vector` existed.
+    """
+    if doc.get("doc_vector"):
+        return _unit(np.asarray(doc["doc_vector"], dtype=np.float32))
+
+    field_vectors = [np.asarray(doc[name], dtype=np.float32) for name in VECTOR_FIELDS if doc.get(name)]
+    if not field_vectors:
+        return None
+    return _unit(_unit(np.stack(field_vectors)).sum(axis=0))
+
+
+def _default_id(doc: dict) -> str:
+    """The id the ETL gives an article: the sha1 of its URL."""
+    return doc.get("_id") or hashlib.sha1(doc["url"].encode("utf-8")).hexdigest()
+
+
+def _timestamp(published_at: Optional[str]) -> float:
+    """Epoch seconds of a publishedAt value, NaN when it is missing or malformed so date filters exclude it."""
+    try:
+        return datetime.fromisoformat(published_at.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return float("nan")
+
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the unit vectors, returning unit centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), n_lists * 256)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        empty = np.bincount(assignments, minlength=n_lists) == 0
+        sums[empty] = centroids[empty]
+        centroids = _unit(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(np.asarray(vectors[start:start + chunk_size], dtype=np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), chunk_size)
+    ])
+
+
+def iter_ndjson(path: Path) -> Iterator[dict]:
+    """Streams the documents of a NDJSON dump written by `export_index`."""
+    with open(path, mode="rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def build_local_store(documents: Iterable[dict], path: Path, dtype: str = "float32", n_lists: int = 0,
+                      id_fn: Callable[[dict], str] = _default_id) -> int:
+    """
+    Writes a local store from indexed documents, either the output of the ETL transform or an index dump.
+
+    The store is a directory holding the unit document vectors as a `.npy` matrix, the fields documents
+    are built from as JSON records located by an offsets array, a BM25 inverted index as flat postings arrays and,
+    with `n_lists`, an IVF partition of the vectors. Every file is memory-mapped when the store is opened.
+
+    Parameters:
+        documents (Iterable[dict]): Documents with a `doc_vector` or per-field vectors.
+        path (Path): Directory of the store, created if needed.
+        dtype (str): Storage type of the vectors, "float32" or "float16".
+        n_lists (int): Number of IVF lists, 0 for brute-force search only.
+        id_fn (Callable[[dict], str]): Derives the id of a document, the sha1 of its URL by default.
+
+    Returns:
+        int: Number of stored documents.
+    """
+    started = time.perf_counter()
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    vectors = []
+    offsets = [0]
+    doc_terms = []
+    published_at = []
+    labels = {name: {} for name in LABEL_FIELDS}
+    label_codes = {name: [] for name in LABEL_FIELDS}
+    skipped = 0
+    with open(path / "metadata.bin", mode="wb") as metadata:
+        for doc in documents:
+            vector = document_vector(doc)
+            if vector is None:
+                skipped += 1
+                continue
+
+            record = {"_id": id_fn(doc), **{name: doc.get(name) for name in SOURCE_FIELDS}}
+            data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+            metadata.write(data)
+            offsets.append(offsets[-1] + len(data))
+            vectors.append(vector)
+            published_at.append(_timestamp(doc.get("publishedAt")))
+            for name in LABEL_FIELDS:
+                label_codes[name].append(labels[name].setdefault(doc.get(name), len(labels[name])))
+
+            terms = Counter()
+            for name, boost in TEXT_BOOSTS.items():
+                for token in tokenize(doc.get(name)):
+                    terms[token] += boost
+            doc_terms.append(terms)
+
+    if not vectors:
+        raise ValueError("No document with a vector to store.")
+
+    matrix = np.stack(vectors).astype(dtype)
+    np.save(path / "vectors.npy", matrix)
+    np.save(path / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+    np.save(path / "published_at.npy", np.asarray(published_at, dtype=np.float64))
+    for name in LABEL_FIELDS:
+        np.save(path / f"{name}_codes.npy", np.asarray(label_codes[name], dtype=np.int32))
+    (path / "labels.json").write_text(json.dumps({name: list(values) for name, values in labels.items()},
+                                                 ensure_ascii=False), encoding="utf-8")
+
+    vocabulary = {}
+    term_ids, doc_ids, frequencies = [], [], []
+    for doc_index, terms in enumerate(doc_terms):
+        for term, frequency in terms.items():
+            term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+            doc_ids.append(doc_index)
+            frequencies.append(frequency)
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    order = np.argsort(term_ids, kind="stable")
+    postings_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=postings_offsets[1:])
+
+    np.save(path / "postings_offsets.npy", postings_offsets)
+    np.save(path / "postings_docs.npy", np.asarray(doc_ids, dtype=np.int32)[order])
+    np.save(path / "postings_tf.npy", np.asarray(frequencies, dtype=np.float32)[order])
+    np.save(path / "doc_lengths.npy", np.asarray([sum(terms.values()) for terms in doc_terms], dtype=np.float32))
+    (path / "vocabulary.json").write_text(json.dumps(vocabulary, ensure_ascii=False), encoding="utf-8")
+
+    n_lists = min(n_lists, len(matrix))
+    if n_lists:
+        centroids = _kmeans(matrix, n_lists)
+        assignments = _assign(matrix, centroids)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_offsets[1:])
+        np.save(path / "ivf_centroids.npy", centroids)
+        np.save(path / "ivf_offsets.npy", list_offsets)
+        np.save(path / "ivf_members.npy", np.argsort(assignments, kind="stable").astype(np.int32))
+    else:
+        for name in ("ivf_centroids.npy", "ivf_offsets.npy", "ivf_members.npy"):
+            (path / name).unlink(missing_ok=True)
+
+    manifest = {"count": len(matrix), "dim": matrix.shape[1], "dtype": dtype, "n_lists": n_lists}
+    (path / "store.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+    print(f"Stored {len(matrix)} documents ({skipped} without vectors skipped) in '{path}' "
+          f"in {time.perf_counter() - started:.1f}s.")
+    return len(matrix)
+
+
+class LocalVectorStore:
+    def __init__(self, path: Path, k1: float = 1.2, b: float = 0.75):
+        """
+        Opens a store written by `build_local_store`. The vectors, records and postings are memory-mapped,
+        so opening is fast and pages are only read when searches touch them. The vectors of a float16 store
+        are converted to float32 once here, rather than on every search.
+
+        Parameters:
+            path (Path): Directory of the store.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 document length normalisation.
+        """
+        path = Path(path)
+        manifest = json.loads((path / "store.json").read_text(encoding="utf-8"))
+        self.path = path
+        self.dim = manifest["dim"]
+        self.k1 = k1
+
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        if self.vectors.dtype != np.float32:
+            self.vectors = self.vectors.astype(np.float32)
+        self.offsets = np.load(path / "offsets.npy")
+        # A plain ndarray view of the records, slicing a memmap costs more than decoding a small record.
+        self.metadata = np.asarray(np.memmap(path / "metadata.bin", dtype=np.uint8, mode="r"))
+
+        self.vocabulary = json.loads((path / "vocabulary.json").read_text(encoding="utf-8"))
+        self.postings_offsets = np.load(path / "postings_offsets.npy", mmap_mode="r")
+        self.postings_docs = np.load(path / "postings_docs.npy", mmap_mode="r")
+        self.postings_tf = np.load(path / "postings_tf.npy", mmap_mode="r")
+        doc_lengths = np.load(path / "doc_lengths.npy")
+        document_frequencies = np.diff(self.postings_offsets)
+        self.idf = np.log1p((len(self) - document_frequencies + 0.5) / (document_frequencies + 0.5)).astype(np.float32)
+        self.length_norm = (k1 * (1 - b + b * doc_lengths / max(float(doc_lengths.mean()), 1e-12))).astype(np.float32)
+
+        self.published_at = None
+        if (path / "published_at.npy").exists():
+            self.published_at = np.load(path / "published_at.npy")
+            self.labels = json.loads((path / "labels.json").read_text(encoding="utf-8"))
+            self.label_codes = {name: np.load(path / f"{name}_codes.npy") for name in LABEL_FIELDS}
+
+        self.centroids = self.list_offsets = self.list_members = None
+        if manifest.get("n_lists"):
+            self.centroids = np.load(path / "ivf_centroids.npy")
+            self.list_offsets = np.load(path / "ivf_offsets.npy")
+            self.list_members = np.load(path / "ivf_members.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def record(self, index: int) -> dict:
+        """Decodes the stored fields of one document."""
+        return json.loads(self.metadata[self.offsets[index]:self.offsets[index + 1]].tobytes())
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.postings_offsets[term_id], self.postings_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            frequencies = self.postings_tf[start:end]
+            scores[docs] += self.idf[term_id] * frequencies * (self.k1 + 1) / (frequencies + self.length_norm[docs])
+        return scores
+
+    def probe(self, query_vector: np.ndarray, n_probe: int) -> np.ndarray:
+        """Indices of the documents in the `n_probe` IVF lists closest to the query."""
+        lists = np.argsort(self.centroids @ query_vector)[::-1][:n_probe]
+        return np.concatenate([self.list_members[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists])
+
+    def filter_mask(self, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+        """Boolean mask of the documents matching the filters, None when nothing is filtered."""
+        if not filters:
+            return None
+        if self.published_at is None:
+            raise ValueError(f"The store at '{self.path}' was built without filter fields, rebuild it to filter.")
+
+        mask = np.ones(len(self), dtype=bool)
+        if filters.since:
+            mask &= self.published_at >= filters.since.timestamp()
+        if filters.until:
+            mask &= self.published_at < filters.until.timestamp()
+        for name, values in (("topic", filters.topics), ("source_name", filters.sources)):
+            if values:
+                codes = [self.labels[name].index(value) for value in values if value in self.labels[name]]
+                mask &= np.isin(self.label_codes[name], codes)
+        return mask
+
+    def search(self, query_vector: Optional[List[float]], query: str, top_k: int = 10, vector_weight: float = 0.7,
+               n_probe: Optional[int] = None, filters: Optional[SearchFilters] = None) -> List[dict]:
+        """
+        Scores documents by `vector_weight * cosine + (1 - vector_weight) * BM25 / max BM25` and returns the
+        top ones as Elasticsearch-style hits.
+
+        Parameters:
+            query_vector (Optional[List[float]]): Embedding of the query, unused when `vector_weight` is 0.
+            query (str): Text of the query, unused when `vector_weight` is 1.
+            top_k (int): Number of hits to return.
+            vector_weight (float): Weight of the cosine similarity against the normalised BM25 score.
+            n_probe (Optional[int]): IVF lists scanned, all documents are scanned when None or without IVF.
+                The best BM25 matches are scored as well, wherever they are partitioned.
+            filters (Optional[SearchFilters]): Restricts the documents scored, before any similarity is computed.
+
+        Returns:
+            List[dict]: Hits with `_id`, `_score` and `_source`, best first.
+        """
+        mask = self.filter_mask(filters)
+        candidates = None
+        bm25 = self.bm25_scores(query) if vector_weight < 1 else None
+        if bm25 is not None and mask is not None:
+            bm25[~mask] = 0
+
+        lexical = None if bm25 is None else (1 - vector_weight) * bm25 / max(float(bm25.max()), 1e-12)
+
+        if vector_weight > 0:
+            query_vector = _unit(np.asarray(query_vector, dtype=np.float32))
+            if query_vector.shape[-1] != self.dim:
+                raise ValueError(f"Query vector has {query_vector.shape[-1]} dimensions, the store {self.dim}.")
+
+            if self.centroids is not None and n_probe:
+                candidates = self.probe(query_vector, n_probe)
+                if mask is not None:
+                    candidates = candidates[mask[candidates]]
+                if bm25 is not None:
+                    matched = np.flatnonzero(bm25)
+                    pool = min(len(matched), max(top_k * 10, 100))
+                    if pool < len(matched):
+                        matched = matched[np.argpartition(-bm25[matched], pool - 1)[:pool]]
+                    candidates = np.union1d(candidates, matched)
+                else:
+                    candidates = np.sort(candidates)
+            elif mask is not None:
+                candidates = np.flatnonzero(mask)
+
+            # The stored vectors are unit float32 rows, so one matrix-vector product gives every cosine.
+            scores = (self.vectors if candidates is None else self.vectors[candidates]) @ query_vector
+            if vector_weight != 1:
+                scores *= vector_weight
+            if lexical is not None:
+                scores += lexical if candidates is None else lexical[candidates]
+        else:
+            candidates = np.flatnonzero(bm25)
+            scores = lexical[candidates]
+
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        hits = []
+        for position in top:
+            index = int(candidates[position]) if candidates is not None else int(position)
+            source = self.record(index)
+            hits.append({"_id": source.pop("_id"), "_score": float(scores[position]), "_source": source})
+        return hits
+
+
+class LocalInformationRetriever(InformationRetriever):
+    """
+    The retriever interface over a `LocalVectorStore` instead of Elasticsearch. Strategies are "hybrid",
+    "vector" (cosine only) and "bm25" (lexical only).
+    """
+    es_client: Optional[Elasticsearch] = None
+    store: LocalVectorStore = Field(...)
+    strategy: str = "hybrid"
+    vector_weight: float = 0.7
+    n_probe: Optional[int] = 8
+
+    @root_validator(pre=True)
+    def validate_es_client(cls, values):
+        if not values.get("store"):
+            raise ValueError("store is required and cannot be None.")
+        return values
+
+    def _vector_weight(self, strategy: Optional[str]) -> float:
+        strategy = strategy or self.strategy
+        if strategy not in LOCAL_STRATEGIES:
+            raise ValueError(f"Unknown local strategy '{strategy}', expected one of {LOCAL_STRATEGIES}.")
+        return {"hybrid": self.vector_weight, "vector": 1.0, "bm25": 0.0}[strategy]
+
+    def _search_store(self, query: str, query_vector: Optional[List[float]], top_k: int, vector_weight: float,
+                      filters: Optional[SearchFilters]) -> List[Document]:
+        hits = self.store.search(query_vector, query, top_k=top_k, vector_weight=vector_weight, n_probe=self.n_probe,
+                                 filters=filters)
+        results = [hit_to_document(hit) for hit in hits]
+        self.log_documents(query, results)
+        return results
+
+    def search(self, query: str, top_k: int = 10, strategy: Optional[str] = None,
+               filters: Optional[SearchFilters] = None) -> List[Document]:
+        """Searches the local store and returns Document objects, see `InformationRetriever.search`."""
+        vector_weight = self._vector_weight(strategy)
+        query_vector = self.vectorize_query(query) if vector_weight > 0 else None
+        return self._search_store(query, query_vector, top_k, vector_weight, filters)
+
+    def search_many(self, queries: List[str], top_k: int = 10, strategy: Optional[str] = None,
+                    filters: Optional[SearchFilters] = None) -> List[SearchResult]:
+        """Searches the local store for several queries embedded in one batch, see `search_many` of the base class."""
+        vector_weight = self._vector_weight(strategy)
+        query_vectors = self.vectorize_queries(queries) if vector_weight > 0 and queries else [None] * len(queries)
+
+        results = []
+        for query, query_vector in zip(queries, query_vectors):
+            try:
+                results.append(SearchResult(query=query, documents=self._search_store(query, query_vector, top_k,
+                                                                                      vector_weight, filters)))
+            except Exception as e:
+                results.append(SearchResult(query=query, error=str(e)))
+        return results
+
+
+def benchmark_store(store: LocalVectorStore, searches: int = 200, top_k: int = 10, n_probe: Optional[int] = None,
+                    seed: int = 0) -> dict:
+    """Times searches with random query vectors and random vocabulary terms, returning percentiles in microseconds."""
+    rng = np.random.default_rng(seed)
+    vocabulary = list(store.vocabulary)
+    report = {}
+    for strategy, vector_weight in (("vector", 1.0), ("bm25", 0.0), ("hybrid", 0.7)):
+        timings = []
+        for _ in range(searches):
+            query_vector = rng.standard_normal(store.dim).astype(np.float32)
+            query = " ".join(rng.choice(vocabulary, 3)) if vocabulary else ""
+            started = time.perf_counter()
+            store.search(query_vector, query, top_k=top_k, vector_weight=vector_weight, n_probe=n_probe)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        report[strategy] = {"p50_us": timings[len(timings) // 2], "p95_us": timings[int(len(timings) * 0.95)],
+                            "mean_us": statistics.mean(timings)}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or benchmark a local vector store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Build a store from a NDJSON index dump.")
+    build_parser.add_argument("dump", type=Path)
+    build_parser.add_argument("store", type=Path)
+    build_parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    build_parser.add_argument("--lists", type=int, default=0, help="Number of IVF lists, 0 to disable IVF.")
+
+    bench_parser = commands.add_parser("bench", help="Time searches on a store.")
+    bench_parser.add_argument("store", type=Path)
+    bench_parser.add_argument("--searches", type=int, default=200)
+    bench_parser.add_argument("--probe", type=int, default=None, help="IVF lists scanned per search.")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build_local_store(iter_ndjson(args.dump), args.store, dtype=args.dtype, n_lists=args.lists)
+    else:
+        for name, row in benchmark_store(LocalVectorStore(args.store), searches=args.searches,
+                                         n_probe=args.probe).items():
+            print(f"{name:<8}" + "".join(f"{column}={value:10.1f}  " for column, value in row.items()))
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Case-folds the query and collapses whitespace, so trivially different phrasings share a cache entry."""
+    return " ".join(query.casefold().split())
+
+
+class QueryVectorCache:
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None,
+                 normalize: Callable[[str], Hashable] = normalize_query):
+        """
+        Thread-safe in-process LRU cache of query embeddings.
+
+        Parameters:
+            max_size (int): Maximum number of cached query vectors.
+            ttl_seconds (Optional[float]): Time after which an entry expires, None to never expire.
+            normalize (Callable[[str], Hashable]): Maps a query to its cache key.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.normalize = normalize
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.compute_seconds = 0.0
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """Returns the cached vector of the query, or None on a miss."""
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, query: str, vector: List[float], compute_seconds: float = 0.0) -> None:
+        """
+        Stores the vector of the query.
+
+        Parameters:
+            query (str): The query.
+            vector (List[float]): Its embedding.
+            compute_seconds (float): Time it took to compute the embedding, used to estimate the time saved by hits.
+        """
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            self.compute_seconds += compute_seconds
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Returns the hit ratio and the estimated embedding time saved by hits."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            mean_compute = self.compute_seconds / self.misses if self.misses else 0.0
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "mean_embedding_ms": mean_compute * 1000,
+                "saved_seconds": self.hits * mean_compute
+            }
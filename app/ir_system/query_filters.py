@@ -0,0 +1,167 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# The `topic` values the ETL tags articles with, the TOPICS of vector_db/pipelines/news_api/extract.py.
+NEWS_TOPICS = [
+    "artificial intelligence OR ai",
+    "blockchain OR cryptocurrency",
+    "cybersecurity OR hacking",
+    "cloud computing OR edge computing",
+    "quantum computing OR quantum cryptography",
+    "data science OR big data",
+    "5G OR network technology",
+    "augmented reality OR virtual reality",
+    "internet of things OR IoT",
+    "green technology OR renewable energy",
+    "digital privacy OR data protection",
+    "fintech OR digital banking",
+    "e-commerce OR digital marketplaces",
+    "gaming OR esports",
+    "autonomous vehicles OR self-driving cars",
+    "wearable technology OR fitness tech",
+    "software development OR coding",
+    "biotechnology OR genetic engineering",
+    "space technology OR space exploration",
+    "educational technology OR online learning",
+    "robotics OR automation",
+    "digital marketing OR social media",
+    "nanotechnology OR nanoengineering",
+    "smart cities OR urban tech",
+    "healthtech OR telemedicine",
+    "supply chain technology OR logistics tech",
+    "3D printing OR additive manufacturing",
+    "drones OR unmanned aerial vehicles",
+    "natural language processing OR NLP",
+    "predictive analytics OR business intelligence",
+    "smart home OR home automation",
+    "Tesla OR electric vehicles",
+    "Apple OR iPhone",
+    "Google OR Alphabet",
+    "Microsoft OR Windows",
+    "Amazon OR e-commerce",
+    "Meta OR Facebook",
+    "Samsung OR Galaxy",
+    "Nvidia OR GPUs",
+    "Intel OR processors",
+    "IBM OR mainframe",
+    "Oracle OR database",
+    "Zoom OR video conferencing",
+    "Salesforce OR CRM",
+    "TikTok OR ByteDance",
+    "Spotify OR music streaming",
+    "Netflix OR streaming services",
+    "Adobe OR creative software",
+    "Snapchat OR social media",
+    "Uber OR ride-sharing",
+    "Lyft OR ride-hailing",
+    "PayPal OR online payments"
+]
+
+_NUMBERS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+            "eight": 8, "nine": 9, "ten": 10, "few": 3, "couple of": 2}
+_UNITS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1),
+          "month": timedelta(days=30), "year": timedelta(days=365)}
+
+_PREFIX = r"(?:(?:from|in|during|over|for|of|since)\s+)?(?:the\s+)?"
+_TIME_EXPRESSIONS = [
+    ("span", re.compile(
+        _PREFIX + r"(?:last|past|previous)\s+(\d+|" + "|".join(_NUMBERS) + r")\s+(hour|day|week|month|year)s?\b",
+        re.IGNORECASE
+    )),
+    ("rolling", re.compile(_PREFIX + r"(?:last|past|previous)\s+(day|week|month|year)\b", re.IGNORECASE)),
+    ("calendar", re.compile(_PREFIX + r"this\s+(week|month|year)\b", re.IGNORECASE)),
+    ("today", re.compile(_PREFIX + r"\b(today|tonight)\b", re.IGNORECASE)),
+    ("yesterday", re.compile(_PREFIX + r"\byesterday\b", re.IGNORECASE)),
+    ("year", re.compile(r"\b(?:(?:from|in|during)\s+)(20\d\d)\b", re.IGNORECASE)),
+]
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """
+    Structured restrictions of a search, applied before the kNN traversal. Immutable, so it can be part
+    of a cache key.
+
+    Attributes:
+        since (Optional[datetime]): Earliest publication time, inclusive.
+        until (Optional[datetime]): Latest publication time, exclusive.
+        topics (Tuple[str, ...]): Accepted `topic` values, any topic when empty.
+        sources (Tuple[str, ...]): Accepted `source_name` values, any source when empty.
+    """
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    topics: Tuple[str, ...] = ()
+    sources: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.since or self.until or self.topics or self.sources)
+
+    def clauses(self) -> List[dict]:
+        """The Elasticsearch filter clauses, used both as kNN pre-filters and as bool filters."""
+        clauses = []
+        if self.since or self.until:
+            published = {}
+            if self.since:
+                published["gte"] = self.since.strftime(DATE_FORMAT)
+            if self.until:
+                published["lt"] = self.until.strftime(DATE_FORMAT)
+            clauses.append({"range": {"publishedAt": published}})
+        if self.topics:
+            clauses.append({"terms": {"topic": list(self.topics)}})
+        if self.sources:
+            clauses.append({"terms": {"source_name": list(self.sources)}})
+        return clauses
+
+
+def _time_range(kind: str, match: re.Match, now: datetime) -> Tuple[Optional[datetime], Optional[datetime]]:
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind == "span":
+        amount = match.group(1).lower()
+        amount = int(amount) if amount.isdigit() else _NUMBERS[amount]
+        return now - amount * _UNITS[match.group(2).lower()], None
+    if kind == "rolling":
+        return now - _UNITS[match.group(1).lower()], None
+    if kind == "calendar":
+        unit = match.group(1).lower()
+        if unit == "week":
+            return today - timedelta(days=today.weekday()), None
+        if unit == "month":
+            return today.replace(day=1), None
+        return today.replace(month=1, day=1), None
+    if kind == "today":
+        return today, None
+    if kind == "yesterday":
+        return today - timedelta(days=1), today
+    year = int(match.group(1))
+    return datetime(year, 1, 1, tzinfo=timezone.utc), datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_query_filters(query: str, now: Optional[datetime] = None) -> Tuple[str, Optional[SearchFilters]]:
+    """
+    Pulls the first relative time expression ("this week", "past 3 days", "yesterday", "in 2024", ...)
+    out of a search query and turns it into a publication date filter. "last week" and similar are
+    rolling windows ending now, "this week" starts on Monday.
+
+    Parameters:
+        query (str): The generated IR query.
+        now (Optional[datetime]): Reference time, the current UTC time by default.
+
+    Returns:
+        Tuple[str, Optional[SearchFilters]]: The query without the time expression, and the filters,
+        None if the query has no time expression.
+    """
+    now = now or datetime.now(timezone.utc)
+    for kind, pattern in _TIME_EXPRESSIONS:
+        match = pattern.search(query)
+        if match is None:
+            continue
+
+        since, until = _time_range(kind, match, now)
+        remainder = " ".join((query[:match.start()] + " " + query[match.end():]).split()).strip(" ,.?!")
+        return remainder or query, SearchFilters(since=since, until=until)
+
+    return query, None
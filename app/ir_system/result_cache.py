@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional
+
+from elasticsearch import Elasticsearch
+from langchain.schema import Document
+
+from app.ir_system.query_cache import normalize_query
+
+
+class IndexGeneration:
+    def __init__(self, es_client: Elasticsearch, alias: str, state_index: str = "etl_state",
+                 check_interval: float = 0.0):
+        """
+        Tracks the generation stamp the ETL pipeline bumps in the state document of an alias after every load.
+
+        By default the stamp is re-read on every lookup, so no result cached before a load is served after it.
+        A positive `check_interval` saves that round trip, at the cost of serving stale results for up to
+        that many seconds after a load.
+
+        Parameters:
+            es_client (Elasticsearch): The Elasticsearch client instance.
+            alias (str): The alias the retriever queries, the id of its ETL state document.
+            state_index (str): The index holding ETL state documents.
+            check_interval (float): Seconds a read of the stamp is reused for, 0 to read it on every lookup.
+        """
+        self.es_client = es_client
+        self.alias = alias
+        self.state_index = state_index
+        self.check_interval = check_interval
+
+        self._generation = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[int]:
+        """Returns the generation of the alias, 0 if it was never bumped and None if it could not be read yet."""
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._generation
+
+        # Read outside the lock, so concurrent lookups do not queue behind each other's round trip.
+        checked_at = time.monotonic()
+        try:
+            response = self.es_client.options(ignore_status=404).get(index=self.state_index, id=self.alias,
+                                                                     source_includes=["generation"])
+            generation = response.get("_source", {}).get("generation", 0) if response.get("found") else 0
+        except Exception as e:
+            print(f"Failed to read the generation of '{self.alias}': {e}")
+            with self._lock:
+                self._checked_at = max(self._checked_at or checked_at, checked_at)
+                return self._generation
+
+        with self._lock:
+            if self._checked_at is None or checked_at >= self._checked_at:
+                self._generation, self._checked_at = generation, checked_at
+            return generation
+
+
+class ResultCache:
+    def __init__(self, generation: Callable[[], Optional[int]], max_size: int = 1024,
+                 normalize: Callable[[str], Hashable] = normalize_query):
+        """
+        Thread-safe LRU cache of search results, valid for one index generation.
+
+        Entries are keyed by the normalized query, top_k, strategy and filters. Callers read the
+        generation once before searching and pass it to both `get` and `put`. A lookup at a new
+        generation drops every entry, results computed at an older generation are not stored, and
+        while the generation is unknown the cache is bypassed.
+
+        Parameters:
+            generation (Callable[[], Optional[int]]): Returns the current index generation,
+                e.g. `IndexGeneration.current`.
+            max_size (int): Maximum number of cached result lists.
+            normalize (Callable[[str], Hashable]): Maps a query to the query part of the key.
+        """
+        self.generation = generation
+        self.max_size = max_size
+        self.normalize = normalize
+
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _key(self, query: str, top_k: int, strategy: str, filters: Optional[Hashable]) -> tuple:
+        return self.normalize(query), top_k, strategy, filters
+
+    def get(self, query: str, top_k: int, strategy: str, filters: Optional[Hashable] = None, *,
+            generation: Optional[int]) -> Optional[List[Document]]:
+        """Returns the cached documents of the search at the given generation, or None on a miss."""
+        key = self._key(query, top_k, strategy, filters)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._generation = generation
+
+            documents = self._entries.get(key) if generation is not None else None
+            if documents is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(documents)
+
+    def put(self, query: str, top_k: int, strategy: str, documents: List[Document],
+            filters: Optional[Hashable] = None, *, generation: Optional[int]) -> None:
+        """Stores the documents of a search, unless the generation changed since it was looked up."""
+        key = self._key(query, top_k, strategy, filters)
+        with self._lock:
+            if generation is None or generation != self._generation:
+                return
+            self._entries[key] = list(documents)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Returns the hit ratio and the generation the cached results belong to."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
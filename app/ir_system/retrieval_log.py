@@ -0,0 +1,92 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import List
+
+from langchain.schema import Document
+
+_STOP = object()
+
+
+class RetrievalLogger:
+    def __init__(self, path: str = "retriever_log.jsonl", sample_rate: float = 1.0, queue_size: int = 10_000,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        """
+        Non-blocking retrieval log. Requests only enqueue a compact record (query, document ids and scores),
+        a background thread writes the records to rotating JSONL files. When the queue is full, records
+        are dropped instead of blocking the request.
+
+        Parameters:
+            path (str): Path of the active log file, rotated files get a numeric suffix.
+            sample_rate (float): Fraction of searches that are logged.
+            queue_size (int): Maximum number of records waiting to be written.
+            max_bytes (int): Size at which the log file is rotated.
+            backup_count (int): Number of rotated files kept.
+        """
+        self.sample_rate = sample_rate
+        self.logged = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                            encoding="utf-8", delay=True)
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._thread = threading.Thread(target=self._write_loop, name="retrieval-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, query: str, documents: List[Document]) -> bool:
+        """
+        Enqueues a record of the search, without waiting for the disk.
+
+        Returns:
+            bool: True if the record was enqueued, False if it was sampled out or dropped.
+        """
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "query": query,
+            "documents": [
+                {"id": doc.metadata.get("id"), "score": doc.metadata.get("score")}
+                for doc in documents
+            ]
+        }
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                self._handler.close()
+                return
+            try:
+                self._handler.emit(logging.makeLogRecord({"msg": json.dumps(record, ensure_ascii=False)}))
+                self.logged += 1
+            except Exception as e:
+                print(f"Failed to write log: {e}")
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Writes the queued records and stops the writer thread."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        """Returns the number of written, dropped and pending records."""
+        return {"logged": self.logged, "dropped": self.dropped, "pending": self._queue.qsize()}
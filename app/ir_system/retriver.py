@@ -1,19 +1,64 @@
-import json
-from typing import List, Dict
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
 from pydantic import BaseModel, Field, root_validator
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 from langchain.schema import BaseRetriever, Document
 from models.huggingface.embedding import TextEmbedder
-from datetime import datetime
+from models.huggingface.embedding_cache import EmbeddingCache
+from app.ir_system.query_cache import QueryVectorCache
+from app.ir_system.query_filters import SearchFilters
+from app.ir_system.result_cache import ResultCache
+from app.ir_system.retrieval_log import RetrievalLogger
+from app.ir_system.search_strategies import SearchStrategy, default_strategies
+
+
+SOURCE_FIELDS = ["title", "description", "content", "author", "publishedAt", "source_name", "url", "topic"]
+
+
+def hit_to_document(hit: dict) -> Document:
+    """Converts an Elasticsearch hit into a Document, preferring the server-side truncated content when present."""
+    source = hit["_source"]
+    content = hit.get("highlight", {}).get("content", [source.get("content", "")])[0]
+    return Document(
+        page_content=f"{source.get('title', '')}\n\n{source.get('description', '')}\n\n{content}",
+        metadata={
+            "id": hit["_id"],
+            "author": source.get("author", "Unknown"),
+            "publishedAt": source.get("publishedAt"),
+            "source_name": source.get("source_name"),
+            "url": source.get("url"),
+            "topic": source.get("topic"),
+            "score": hit["_score"]
+        }
+    )
+
+
+@dataclass
+class SearchResult:
+    """The outcome of one query of a multi-search: its documents, or the error Elasticsearch reported for it."""
+    query: str
+    documents: List[Document] = field(default_factory=list)
+    error: Optional[str] = None
 
 
 class InformationRetriever(BaseRetriever, BaseModel):
     es_client: Elasticsearch = Field(...)
+    async_es_client: Optional[AsyncElasticsearch] = None
+    search_timeout: Optional[float] = None
     embedder: TextEmbedder = Field(default_factory=TextEmbedder)
-    index_name: str = "tech_news_01"
+    embedding_cache: Optional[EmbeddingCache] = None
+    query_cache: Optional[QueryVectorCache] = Field(default_factory=QueryVectorCache)
+    result_cache: Optional[ResultCache] = None
+    index_name: str = "tech_news"
+    strategy: str = "legacy"
+    strategies: Dict[str, SearchStrategy] = Field(default_factory=default_strategies)
+    source_fields: List[str] = Field(default_factory=lambda: list(SOURCE_FIELDS))
+    max_content_chars: Optional[int] = None
 
     tags: List[str] = Field(default_factory=list)
-    log_file: str = "retriever_log.json"
+    retrieval_logger: Optional[RetrievalLogger] = Field(default_factory=RetrievalLogger)
 
     class Config:
         arbitrary_types_allowed = True
@@ -25,105 +70,239 @@ class InformationRetriever(BaseRetriever, BaseModel):
         return values
 
     def vectorize_query(self, query: str) -> List[float]:
-        """Vectorizes the input query using the embedding model."""
-        return self.embedder.get_embedding(query)[0]
+        """Vectorizes the input query using the embedding model, reusing cached vectors when available."""
+        if self.query_cache is not None:
+            vector = self.query_cache.get(query)
+            if vector is not None:
+                return vector
 
-    def log_documents(self, query: str, documents: List[Document]):
-        """Logs the retrieved documents to a JSON file."""
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "query": query,
-            "documents": [
-                {
-                    "page_content": doc.page_content,
-                    "metadata": doc.metadata
-                }
-                for doc in documents
-            ]
+        started = time.perf_counter()
+        if self.embedding_cache is not None:
+            vector = self.embedding_cache.embed([query], self.embedder)[0].tolist()
+        else:
+            vector = self.embedder.get_embedding(query, as_list=True)[0]
+
+        if self.query_cache is not None:
+            self.query_cache.put(query, vector, compute_seconds=time.perf_counter() - started)
+        return vector
+
+    def vectorize_queries(self, queries: List[str]) -> List[List[float]]:
+        """Vectorizes several queries, embedding all the cache misses in one batched forward pass."""
+        vectors = [self.query_cache.get(query) if self.query_cache is not None else None for query in queries]
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if not missing:
+            return vectors
+
+        started = time.perf_counter()
+        if self.embedding_cache is not None:
+            computed = [vector.tolist() for vector in self.embedding_cache.embed(missing, self.embedder)]
+        else:
+            computed = self.embedder.get_embedding(missing, as_list=True)
+        compute_seconds = (time.perf_counter() - started) / len(missing)
+
+        computed = dict(zip(missing, computed))
+        if self.query_cache is not None:
+            for query, vector in computed.items():
+                self.query_cache.put(query, vector, compute_seconds=compute_seconds)
+        return [vector if vector is not None else computed[query] for query, vector in zip(queries, vectors)]
+
+    def cache_stats(self) -> Dict[str, dict]:
+        """Returns the statistics of the query vector cache and of the persistent embedding cache."""
+        return {
+            "query_cache": self.query_cache.stats() if self.query_cache is not None else {},
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache is not None else {},
+            "result_cache": self.result_cache.stats() if self.result_cache is not None else {}
         }
 
-        try:
-            with open(self.log_file, "w") as file:
-                file.write(json.dumps(log_entry, indent=4))
-        except Exception as e:
-            print(f"Failed to write log: {e}")
+    def log_documents(self, query: str, documents: List[Document]):
+        """Hands the ids and scores of the retrieved documents to the background retrieval log."""
+        if self.retrieval_logger is not None:
+            self.retrieval_logger.log(query, documents)
 
-    def search(self, query: str, top_k: int = 10) -> List[Document]:
-        """Performs a powerful hybrid search on Elasticsearch and returns Document objects."""
-        query_vector = self.vectorize_query(query)
+    def build_search_body(self, search_strategy: SearchStrategy, query: str, query_vector: List[float],
+                          top_k: int, filters: Optional[SearchFilters] = None) -> dict:
+        """
+        Builds the request body of a strategy, fetching only the fields documents are built from.
+        Dense vectors are never returned unless the strategy asks for them, and with `max_content_chars`
+        the content is cut server-side to one fragment around the best match.
+        """
+        body = search_strategy.build_body(query, query_vector, top_k, filters.clauses() if filters else None)
+        source_fields = self.source_fields + search_strategy.extra_source_fields
 
-        search_query = {
-            "size": top_k,
-            "query": {
-                "bool": {
-                    "must": [
-                        {
-                            "multi_match": {
-                                "query": query,
-                                "fields": ["title^3", "description^2", "content"],
-                                "type": "best_fields",
-                                "operator": "or",
-                                "fuzziness": "AUTO"
-                            }
-                        }
-                    ],
-                    "should": [
-                        {
-                            "knn": {
-                                "field": "content_vector",
-                                "query_vector": query_vector,
-                                "k": top_k,
-                                "num_candidates": 100
-                            }
-                        },
-                        {
-                            "knn": {
-                                "field": "description_vector",
-                                "query_vector": query_vector,
-                                "k": top_k,
-                                "num_candidates": 100
-                            }
-                        },
-                        {
-                            "knn": {
-                                "field": "title_vector",
-                                "query_vector": query_vector,
-                                "k": top_k,
-                                "num_candidates": 100
-                            }
-                        }
-                    ],
-                    "minimum_should_match": 1
+        if self.max_content_chars:
+            source_fields = [name for name in source_fields if name != "content"]
+            body["highlight"] = {
+                "pre_tags": [""],
+                "post_tags": [""],
+                "fields": {
+                    "content": {
+                        "fragment_size": self.max_content_chars,
+                        "number_of_fragments": 1,
+                        "no_match_size": self.max_content_chars
+                    }
                 }
             }
-        }
+
+        body["_source"] = source_fields
+        return body
+
+    def search(self, query: str, top_k: int = 10, strategy: Optional[str] = None,
+               filters: Optional[SearchFilters] = None) -> List[Document]:
+        """
+        Performs a hybrid search on Elasticsearch and returns Document objects. With a result cache,
+        searches repeated within one index generation are answered without embedding or searching.
+
+        Parameters:
+            query (str): The search query.
+            top_k (int): Number of documents to return.
+            strategy (Optional[str]): Name of the search strategy, defaults to `self.strategy`.
+            filters (Optional[SearchFilters]): Date range, topics and sources applied before the kNN search.
+
+        Returns:
+            List[Document]: The retrieved documents.
+        """
+        strategy = strategy or self.strategy
+        generation = self.result_cache.generation() if self.result_cache is not None else None
+        cached = self._cached_documents(query, top_k, strategy, generation, filters)
+        if cached is not None:
+            return cached
+
+        search_strategy = self.strategies[strategy]
+        query_vector = self.vectorize_query(query)
+
+        search_query = self.build_search_body(search_strategy, query, query_vector, top_k, filters)
         response = self.es_client.search(index=self.index_name, body=search_query)
-        hits = response["hits"]["hits"]
-
-        results = [
-            Document(
-                page_content=f"{hit['_source'].get('title', '')}\n\n{hit['_source'].get('description', '')}\n\n{
-                    hit['_source'].get('content', '')}",
-                metadata={
-                    "author": hit["_source"].get("author", "Unknown"),
-                    "publishedAt": hit["_source"].get("publishedAt"),
-                    "source_name": hit["_source"].get("source_name"),
-                    "url": hit["_source"].get("url"),
-                    "topic": hit["_source"].get("topic"),
-                    "score": hit["_score"]
-                }
-            )
-            for hit in hits
-        ]
+        return self._to_documents(strategy, query, query_vector, top_k, response, generation, filters)
+
+    def search_many(self, queries: List[str], top_k: int = 10, strategy: Optional[str] = None,
+                    filters: Optional[SearchFilters] = None) -> List[SearchResult]:
+        """
+        Runs several searches with one batched embedding pass and a single _msearch request.
+
+        Parameters:
+            queries (List[str]): The search queries.
+            top_k (int): Number of documents to return per query.
+            strategy (Optional[str]): Name of the search strategy, defaults to `self.strategy`.
+            filters (Optional[SearchFilters]): Filters applied to every query.
+
+        Returns:
+            List[SearchResult]: One result per query, in the order of `queries`. A query that failed
+            carries the error instead of documents, without affecting the others.
+        """
+        strategy = strategy or self.strategy
+        generation = self.result_cache.generation() if self.result_cache is not None else None
+        results = [SearchResult(query=query) for query in queries]
+        pending = []
+        for result in results:
+            cached = self._cached_documents(result.query, top_k, strategy, generation, filters)
+            if cached is not None:
+                result.documents = cached
+            else:
+                pending.append(result)
+        if not pending:
+            return results
+
+        search_strategy = self.strategies[strategy]
+        query_vectors = self.vectorize_queries([result.query for result in pending])
+
+        searches = []
+        for result, query_vector in zip(pending, query_vectors):
+            searches.append({"index": self.index_name})
+            searches.append(self.build_search_body(search_strategy, result.query, query_vector, top_k, filters))
+        response = self.es_client.msearch(searches=searches)
+
+        for result, query_vector, item in zip(pending, query_vectors, response["responses"]):
+            error = item.get("error")
+            if error is not None:
+                if isinstance(error, dict):
+                    error = f"{error.get('type')}: {error.get('reason')}"
+                result.error = str(error)
+                continue
+            try:
+                result.documents = self._to_documents(strategy, result.query, query_vector, top_k, item, generation,
+                                                      filters)
+            except Exception as e:
+                result.error = str(e)
+
+        return results
+
+    def _cached_documents(self, query: str, top_k: int, strategy: str, generation: Optional[int],
+                          filters: Optional[SearchFilters] = None) -> Optional[List[Document]]:
+        if self.result_cache is None:
+            return None
+        documents = self.result_cache.get(query, top_k, strategy, filters, generation=generation)
+        if documents is not None:
+            self.log_documents(query, documents)
+        return documents
+
+    def _to_documents(self, strategy: str, query: str, query_vector: List[float], top_k: int, response,
+                      generation: Optional[int] = None, filters: Optional[SearchFilters] = None) -> List[Document]:
+        hits = self.strategies[strategy].postprocess(response["hits"]["hits"], query_vector, top_k)
+
+        results = [hit_to_document(hit) for hit in hits]
+        if self.result_cache is not None:
+            self.result_cache.put(query, top_k, strategy, results, filters, generation=generation)
 
         self.log_documents(query, results)
 
         return results
 
+    async def asearch(self, query: str, top_k: int = 10, strategy: Optional[str] = None,
+                      timeout: Optional[float] = None, filters: Optional[SearchFilters] = None) -> List[Document]:
+        """
+        Performs the search without blocking the event loop.
+
+        The query is embedded in the loop's default executor and the search is sent through the shared
+        connection pool of `async_es_client`. Without an async client the whole blocking search runs in
+        the executor instead. Cancelling the call aborts the Elasticsearch request; an embedding already
+        running finishes in its thread and is kept in the query cache.
+
+        Parameters:
+            query (str): The search query.
+            top_k (int): Number of documents to return.
+            strategy (Optional[str]): Name of the search strategy, defaults to `self.strategy`.
+            timeout (Optional[float]): Seconds before the search is cancelled, defaults to `self.search_timeout`.
+            filters (Optional[SearchFilters]): Date range, topics and sources applied before the kNN search.
+
+        Returns:
+            List[Document]: The retrieved documents.
+
+        Raises:
+            asyncio.TimeoutError: If the search did not finish within the timeout.
+        """
+        timeout = timeout if timeout is not None else self.search_timeout
+        return await asyncio.wait_for(self._asearch(query, top_k, strategy, filters), timeout)
+
+    async def _asearch(self, query: str, top_k: int, strategy: Optional[str],
+                       filters: Optional[SearchFilters]) -> List[Document]:
+        loop = asyncio.get_running_loop()
+        if self.async_es_client is None:
+            return await loop.run_in_executor(None, self.search, query, top_k, strategy, filters)
+
+        strategy = strategy or self.strategy
+        generation = None
+        if self.result_cache is not None:
+            generation = await loop.run_in_executor(None, self.result_cache.generation)
+            cached = self._cached_documents(query, top_k, strategy, generation, filters)
+            if cached is not None:
+                return cached
+
+        search_strategy = self.strategies[strategy]
+        query_vector = await loop.run_in_executor(None, self.vectorize_query, query)
+
+        search_query = self.build_search_body(search_strategy, query, query_vector, top_k, filters)
+        response = await self.async_es_client.search(index=self.index_name, body=search_query)
+        return self._to_documents(strategy, query, query_vector, top_k, response, generation, filters)
+
+    async def aclose(self) -> None:
+        """Closes the connection pool of the async client."""
+        if self.async_es_client is not None:
+            await self.async_es_client.close()
+
     def get_relevant_documents(self, query: str) -> List[Document]:
         """Returns relevant documents for a given query."""
         return self.search(query)
 
     async def aget_relevant_documents(self, query: str) -> List[Document]:
         """Asynchronously returns relevant documents for a given query."""
-        return self.get_relevant_documents(query)
+        return await self.asearch(query)
@@ -0,0 +1,214 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class StrategyConfig:
+    """
+    Tunable parameters of a search strategy.
+
+    Attributes:
+        k (Optional[int]): Nearest neighbours returned per kNN search, defaults to `top_k`.
+        num_candidates (int): Candidates considered per shard by each HNSW traversal.
+        text_boosts (Dict[str, float]): Lexical fields and their boosts.
+        vector_fields (Dict[str, float]): Vector fields and their boosts.
+        fuzziness (Optional[str]): Fuzziness of the lexical match, None to disable it.
+        rank_constant (int): Constant of reciprocal rank fusion.
+        candidate_pool (int): BM25 candidates fetched by two-stage strategies before re-scoring.
+        vector_weight (float): Weight of the cosine similarity against the normalised BM25 score when re-scoring.
+    """
+    k: Optional[int] = None
+    num_candidates: int = 100
+    text_boosts: Dict[str, float] = field(default_factory=lambda: {"title": 3, "description": 2, "content": 1})
+    vector_fields: Dict[str, float] = field(default_factory=lambda: {
+        "content_vector": 1, "description_vector": 1, "title_vector": 1
+    })
+    fuzziness: Optional[str] = "AUTO"
+    rank_constant: int = 60
+    candidate_pool: int = 100
+    vector_weight: float = 0.5
+
+
+class SearchStrategy(ABC):
+    """Builds the Elasticsearch request body of a search, and optionally post-processes its hits."""
+    name = "base"
+    extra_source_fields: List[str] = []
+
+    def __init__(self, config: Optional[StrategyConfig] = None):
+        self.config = config or self.default_config()
+
+    def default_config(self) -> StrategyConfig:
+        return StrategyConfig()
+
+    def text_query(self, query: str) -> dict:
+        """The lexical multi_match clause shared by all strategies."""
+        multi_match = {
+            "query": query,
+            "fields": [f"{name}^{boost}" if boost != 1 else name for name, boost in self.config.text_boosts.items()],
+            "type": "best_fields",
+            "operator": "or"
+        }
+        if self.config.fuzziness:
+            multi_match["fuzziness"] = self.config.fuzziness
+        return {"multi_match": multi_match}
+
+    def filtered_text_query(self, query: str, filters: Optional[List[dict]]) -> dict:
+        """The lexical clause restricted by the filter clauses."""
+        if not filters:
+            return self.text_query(query)
+        return {"bool": {"must": [self.text_query(query)], "filter": filters}}
+
+    def knn_clause(self, vector_field: str, query_vector: List[float], top_k: int,
+                   filters: Optional[List[dict]] = None) -> dict:
+        """A kNN search on one vector field, pre-filtered so the HNSW traversal only visits matching documents."""
+        clause = {
+            "field": vector_field,
+            "query_vector": query_vector,
+            "k": self.config.k or top_k,
+            "num_candidates": max(self.config.num_candidates, self.config.k or top_k)
+        }
+        boost = self.config.vector_fields.get(vector_field, 1)
+        if boost != 1:
+            clause["boost"] = boost
+        if filters:
+            clause["filter"] = filters
+        return clause
+
+    @abstractmethod
+    def build_body(self, query: str, query_vector: List[float], top_k: int,
+                   filters: Optional[List[dict]] = None) -> dict:
+        """Returns the request body of a search for `query`, restricted by the filter clauses."""
+
+    def postprocess(self, hits: List[dict], query_vector: List[float], top_k: int) -> List[dict]:
+        return hits
+
+
+class LegacyHybridStrategy(SearchStrategy):
+    """The original query: a fuzzy multi_match `must` with one `knn` query clause per vector field in `should`."""
+    name = "legacy"
+
+    def build_body(self, query: str, query_vector: List[float], top_k: int,
+                   filters: Optional[List[dict]] = None) -> dict:
+        body = {
+            "size": top_k,
+            "query": {
+                "bool": {
+                    "must": [self.text_query(query)],
+                    "should": [
+                        {"knn": self.knn_clause(vector_field, query_vector, top_k, filters)}
+                        for vector_field in self.config.vector_fields
+                    ],
+                    "minimum_should_match": 1
+                }
+            }
+        }
+        if filters:
+            body["query"]["bool"]["filter"] = filters
+        return body
+
+
+class RRFStrategy(SearchStrategy):
+    """Top-level kNN and BM25 retrievers, merged by reciprocal rank fusion instead of summed scores."""
+    name = "rrf"
+
+    def default_config(self) -> StrategyConfig:
+        return StrategyConfig(num_candidates=50, vector_fields={"content_vector": 1}, fuzziness=None)
+
+    def build_body(self, query: str, query_vector: List[float], top_k: int,
+                   filters: Optional[List[dict]] = None) -> dict:
+        retrievers = [{"standard": {"query": self.filtered_text_query(query, filters)}}]
+        retrievers.extend(
+            {"knn": self.knn_clause(vector_field, query_vector, top_k, filters)}
+            for vector_field in self.config.vector_fields
+        )
+        return {
+            "size": top_k,
+            "retriever": {
+                "rrf": {
+                    "retrievers": retrievers,
+                    "rank_constant": self.config.rank_constant,
+                    "rank_window_size": max(top_k, self.config.k or top_k)
+                }
+            }
+        }
+
+
+class DocVectorStrategy(SearchStrategy):
+    """A single HNSW traversal of the combined `doc_vector` field, linearly combined with BM25."""
+    name = "doc_vector"
+
+    def default_config(self) -> StrategyConfig:
+        return StrategyConfig(vector_fields={"doc_vector": 1}, fuzziness=None)
+
+    def build_body(self, query: str, query_vector: List[float], top_k: int,
+                   filters: Optional[List[dict]] = None) -> dict:
+        vector_field = next(iter(self.config.vector_fields))
+        return {
+            "size": top_k,
+            "knn": self.knn_clause(vector_field, query_vector, top_k, filters),
+            "query": self.filtered_text_query(query, filters)
+        }
+
+
+class BM25RescoreStrategy(SearchStrategy):
+    """
+    Two stages without any HNSW traversal: Elasticsearch returns the `candidate_pool` best BM25 matches with
+    their stored vectors, which are re-scored on the client by cosine similarity blended with BM25.
+    """
+    name = "bm25_rescore"
+
+    def default_config(self) -> StrategyConfig:
+        return StrategyConfig(vector_fields={"doc_vector": 1})
+
+    @property
+    def extra_source_fields(self) -> List[str]:
+        return list(self.config.vector_fields)
+
+    def build_body(self, query: str, query_vector: List[float], top_k: int,
+                   filters: Optional[List[dict]] = None) -> dict:
+        return {
+            "size": max(top_k, self.config.candidate_pool),
+            "query": self.filtered_text_query(query, filters)
+        }
+
+    def postprocess(self, hits: List[dict], query_vector: List[float], top_k: int) -> List[dict]:
+        """Blends the boost-weighted mean cosine of the vector fields with the BM25 score normalised by its maximum."""
+        if not hits:
+            return hits
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        similarity = np.zeros(len(hits), dtype=np.float32)
+        for vector_field, boost in self.config.vector_fields.items():
+            vectors = np.zeros((len(hits), len(query)), dtype=np.float32)
+            for row, hit in enumerate(hits):
+                vector = hit["_source"].pop(vector_field, None)
+                if vector:
+                    vectors[row] = vector
+            norms = np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+            similarity += boost * (vectors @ query) / norms
+        similarity /= sum(self.config.vector_fields.values())
+
+        bm25 = np.asarray([hit["_score"] or 0.0 for hit in hits], dtype=np.float32)
+        scores = self.config.vector_weight * similarity + \
+            (1 - self.config.vector_weight) * bm25 / max(float(bm25.max()), 1e-12)
+
+        order = np.argsort(-scores)[:top_k]
+        for index in order:
+            hits[index]["_score"] = float(scores[index])
+        return [hits[index] for index in order]
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (LegacyHybridStrategy, RRFStrategy, DocVectorStrategy, BM25RescoreStrategy)
+}
+
+
+def default_strategies() -> Dict[str, SearchStrategy]:
+    """Returns one instance of every strategy with its default configuration."""
+    return {name: strategy() for name, strategy in STRATEGIES.items()}
@@ -1,8 +1,23 @@
-from app.ir_system.elastic_connector import connect_to_es
+from app.ir_system.elastic_connector import connect_to_async_es, connect_to_es
 from app.ir_system.retriver import InformationRetriever
+from app.ir_system.local_store import LOCAL_STRATEGIES, LocalInformationRetriever, LocalVectorStore
+from app.ir_system.query_cache import QueryVectorCache
+from app.ir_system.result_cache import IndexGeneration, ResultCache
+from app.ir_system.search_strategies import BM25RescoreStrategy, StrategyConfig, default_strategies
+from app.ir_system.retrieval_log import RetrievalLogger
+from models.huggingface.embedding import TextEmbedder
+from models.huggingface.embedding_cache import EmbeddingCache
 
 
-def get_retriever(es_host: str, es_port: int, es_user: str, es_password: str) -> InformationRetriever:
+def get_retriever(es_host: str, es_port: int, es_user: str, es_password: str,
+                  index_name: str = "tech_news", query_cache_size: int = 1024,
+                  query_cache_ttl: float = None, log_path: str = "retriever_log.jsonl",
+                  log_sample_rate: float = 1.0, strategy: str = "legacy",
+                  max_content_chars: int = None, use_async: bool = False,
+                  search_timeout: float = None, result_cache_size: int = 1024,
+                  result_cache_check_seconds: float = 0.0, state_index: str = "etl_state",
+                  backend: str = "elasticsearch", local_store_path: str = None, rescore_candidate_pool: int = 100,
+                  rescore_vector_weight: float = 0.5) -> InformationRetriever:
     """
     Create an instance of the InformationRetriever class.
 
@@ -11,9 +26,55 @@ def get_retriever(es_host: str, es_port: int, es_user: str, es_password: str) ->
         es_port (int): The Elasticsearch port.
         es_user (str): The Elasticsearch user.
         es_password (str): The Elasticsearch password.
+        index_name (str): The alias the retriever queries.
+        query_cache_size (int): Maximum number of cached query vectors.
+        query_cache_ttl (float): Lifetime of a cached query vector in seconds, None to never expire.
+        log_path (str): Path of the retrieval log.
+        log_sample_rate (float): Fraction of searches written to the retrieval log.
+        strategy (str): Default search strategy, see `app.ir_system.search_strategies`.
+        max_content_chars (int): Length the article content is truncated to server-side, None to return it whole.
+        use_async (bool): Also create an AsyncElasticsearch client, used by `asearch` and `aget_relevant_documents`.
+        search_timeout (float): Default timeout of async searches in seconds, None to wait indefinitely.
+        result_cache_size (int): Maximum number of cached result lists, 0 to disable the result cache.
+        result_cache_check_seconds (float): Seconds a read of the index generation is reused for, 0 to read it
+            before every search so no stale result is served after a load.
+        state_index (str): The index holding the ETL state, including the generation of `index_name`.
+        backend (str): "elasticsearch", or "local" to search the memory-mapped store at `local_store_path`
+            without connecting to Elasticsearch.
+        local_store_path (str): Directory of the local store, see `app.ir_system.local_store`.
+        rescore_candidate_pool (int): BM25 candidates the "bm25_rescore" strategy re-scores.
+        rescore_vector_weight (float): Weight of the cosine similarity in the "bm25_rescore" blend.
 
     Returns:
         InformationRetriever: An instance of the InformationRetriever class.
     """
+    embedder = TextEmbedder()
+    embedding_cache = EmbeddingCache(model_name=embedder.model_name, dim=embedder.dim)
+    query_cache = QueryVectorCache(max_size=query_cache_size, ttl_seconds=query_cache_ttl)
+    retrieval_logger = RetrievalLogger(path=log_path, sample_rate=log_sample_rate)
+
+    if backend == "local":
+        return LocalInformationRetriever(store=LocalVectorStore(local_store_path), embedder=embedder,
+                                         embedding_cache=embedding_cache, query_cache=query_cache,
+                                         retrieval_logger=retrieval_logger,
+                                         strategy=strategy if strategy in LOCAL_STRATEGIES else "hybrid")
+    if backend != "elasticsearch":
+        raise ValueError(f"Unknown retriever backend '{backend}'.")
+
     es_client = connect_to_es(es_host, es_port, es_user, es_password)
-    return InformationRetriever(es_client=es_client)
+    async_es_client = connect_to_async_es(es_host, es_port, es_user, es_password) if use_async else None
+    strategies = default_strategies()
+    strategies[BM25RescoreStrategy.name] = BM25RescoreStrategy(StrategyConfig(
+        vector_fields={"doc_vector": 1}, candidate_pool=rescore_candidate_pool, vector_weight=rescore_vector_weight
+    ))
+
+    result_cache = None
+    if result_cache_size:
+        generation = IndexGeneration(es_client, alias=index_name, state_index=state_index,
+                                     check_interval=result_cache_check_seconds)
+        result_cache = ResultCache(generation=generation.current, max_size=result_cache_size)
+    return InformationRetriever(es_client=es_client, async_es_client=async_es_client, embedder=embedder,
+                                embedding_cache=embedding_cache, query_cache=query_cache, result_cache=result_cache,
+                                retrieval_logger=retrieval_logger, index_name=index_name, strategies=strategies,
+                                strategy=strategy,
+                                max_content_chars=max_content_chars, search_timeout=search_timeout)
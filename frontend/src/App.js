@@ -10,6 +10,7 @@ function App() {
     const [question, setQuestion] = useState('');
     const [chatHistory, setChatHistory] = useState([]);
     const [loading, setLoading] = useState(false);
+    const [status, setStatus] = useState('Loading...');
     const [persona, setPersona] = useState('technical');
     const [personaLocked, setPersonaLocked] = useState(false);
     const [sessionId, setSessionId] = useState(null);
@@ -85,17 +86,63 @@ function App() {
         setChatHistory((prev) => [...prev, userMessage]);
         setQuestion('');
         setLoading(true);
+        setStatus('Loading...');
 
+        // Appends the bot message on the first token, then updates it in place until the stream is done.
+        const showAnswer = (content, streaming) => {
+            setChatHistory((prev) => {
+                const last = prev[prev.length - 1];
+                if (last && last.role === 'bot' && last.streaming) {
+                    return [...prev.slice(0, -1), { role: 'bot', content, streaming }];
+                }
+                return [...prev, { role: 'bot', content, streaming }];
+            });
+        };
+
+        let answer = '';
         try {
-            const response = await axios.post('http://127.0.0.1:8000/ask', {
-                question,
-                persona,
-                session_id: sessionId,
+            const response = await fetch('http://127.0.0.1:8000/ask/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ question, persona, session_id: sessionId }),
             });
-            setChatHistory((prev) => [...prev, { role: 'bot', content: response.data.response }]);
+            if (!response.ok || !response.body) {
+                throw new Error(`Request failed with status ${response.status}`);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finished = false;
+            while (!finished) {
+                const { value, done } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const rawEvents = buffer.split('\n\n');
+                buffer = rawEvents.pop();
+                for (const rawEvent of rawEvents) {
+                    const { event, data } = parseServerSentEvent(rawEvent);
+                    if (event === 'routing') {
+                        setStatus(data.needs_ir ? 'Searching the latest tech news...' : 'Writing the answer...');
+                    } else if (event === 'retrieval') {
+                        setStatus(`Found ${data.documents} articles, writing the answer...`);
+                    } else if (event === 'token') {
+                        answer += data.text;
+                        setLoading(false);
+                        showAnswer(answer, true);
+                    } else if (event === 'done') {
+                        showAnswer(data.response, false);
+                        finished = true;
+                    } else if (event === 'error') {
+                        throw new Error(data.message);
+                    }
+                }
+            }
+            if (!finished) throw new Error('The response stream ended early.');
             handleFeedbackPrompt();
         } catch {
-            setChatHistory((prev) => [...prev, { role: 'bot', content: 'An error occurred.' }]);
+            showAnswer('An error occurred.', false);
         } finally {
             setLoading(false);
         }
@@ -203,7 +250,7 @@ function App() {
                                 </ReactMarkdown>
                             </div>
                         ))}
-                        {loading && <p className="loading">Loading...</p>}
+                        {loading && <p className="loading">{status}</p>}
                     </div>
                     <form onSubmit={handleSubmit} className="input-area">
                         <input
@@ -229,6 +276,19 @@ function App() {
     );
 }
 
+function parseServerSentEvent(rawEvent) {
+    let event = 'message';
+    const dataLines = [];
+    for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trimStart());
+        }
+    }
+    return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : {} };
+}
+
 function FeedbackModal({ onSubmit, closeModal }) {
     const [selectedRating, setSelectedRating] = useState(null);
 
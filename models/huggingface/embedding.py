@@ -1,33 +1,71 @@
+import os
 from typing import Union, List
+import numpy as np
 import torch
 from transformers import AutoModel, AutoTokenizer
 
+DEFAULT_EMBEDDING_MODEL = "avsolatorio/NoInstruct-small-Embedding-v0"
+
 
 class TextEmbedder:
-    def __init__(self, model_name="avsolatorio/NoInstruct-small-Embedding-v0"):
+    def __init__(self, model_name: str = None, batch_size: int = 32, max_length: int = 512):
+        """
+        Loads the tokenizer and the embedding model.
+
+        Parameters:
+            model_name (str): The Hugging Face model name, defaults to `HF_EMBEDDING_MODEL` from the environment.
+            batch_size (int): Default number of texts per forward pass.
+            max_length (int): Maximum number of tokens per text, longer texts are truncated.
+        """
+        model_name = model_name or os.getenv("HF_EMBEDDING_MODEL") or DEFAULT_EMBEDDING_MODEL
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModel.from_pretrained(model_name)
         self.model.eval()
+        self.dim = self.model.config.hidden_size
 
-    def get_embedding(self, text: Union[str, List[str]]):
+    def get_embedding(self, text: Union[str, List[str]], batch_size: int = None, as_list: bool = False):
         """
         Compute embeddings for a given text or list of texts.
 
+        Texts are sorted by token length and embedded in micro-batches, so each batch is only
+        padded to the longest text it contains. Results are returned in the input order.
+
         Parameters:
             text (Union[str, List[str]]): The input text or list of texts to embed.
+            batch_size (int): Number of texts per forward pass, defaults to `self.batch_size`.
+            as_list (bool): Return Python lists instead of a NumPy array.
 
         Returns:
-            torch.Tensor: Embeddings for the input text(s).
+            np.ndarray: Contiguous float32 array of shape (n_texts, dim), or a list of lists if `as_list` is set.
         """
         if isinstance(text, str):
             text = [text]
+        batch_size = batch_size or self.batch_size
+
+        embeddings = np.empty((len(text), self.dim), dtype=np.float32)
+        if not text:
+            return embeddings.tolist() if as_list else embeddings
+
+        encoded = self.tokenizer(text, truncation=True, max_length=self.max_length)["input_ids"]
+        order = sorted(range(len(text)), key=lambda i: len(encoded[i]))
+
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            inp = self.tokenizer.pad({"input_ids": [encoded[i] for i in batch_idx]}, return_tensors="pt")
+            embeddings[batch_idx] = self._embed_batch(inp)
 
-        inp = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True)
+        return embeddings.tolist() if as_list else embeddings
 
-        with torch.no_grad():
+    def _embed_batch(self, inp) -> np.ndarray:
+        """Runs one forward pass and mean-pools the hidden states over non-padding tokens."""
+        with torch.inference_mode():
             output = self.model(**inp)
 
-        embeddings = output.last_hidden_state.mean(dim=1)
-        embeddings = embeddings.tolist()
+        mask = inp["attention_mask"].unsqueeze(-1).to(output.last_hidden_state.dtype)
+        summed = (output.last_hidden_state * mask).sum(dim=1)
+        counts = mask.sum(dim=1).clamp(min=1e-9)
 
-        return embeddings
+        return (summed / counts).float().numpy()
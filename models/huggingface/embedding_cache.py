@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from filelock import FileLock
+
+DEFAULT_CACHE_DIR = Path(os.getenv("EMBEDDING_CACHE_DIR") or Path.home() / ".cache" / "retrievaigen" / "embeddings")
+
+KEY_SIZE = 16
+FORMAT_VERSION = 1
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes unicode and collapses whitespace so trivially different texts share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, dim: int, cache_dir: str | Path = DEFAULT_CACHE_DIR,
+                 memory_size: int = 10_000, initial_capacity: int = 1024):
+        """
+        Content-addressed embedding cache persisted on disk and fronted by an in-memory LRU.
+
+        Vectors are stored in a memory-mapped float32 file, one row per text. The row of each text
+        is given by the position of its 16-byte key in an append-only key file, so the on-disk
+        index is just the list of keys. The cache is shared between processes (ETL and API),
+        writes are serialised with a file lock. When the model name or dimension changes the
+        cached vectors are discarded. Every time the files are recreated, a new generation is written
+        to the meta file, so other processes drop their index instead of reading the new files with it.
+
+        Parameters:
+            model_name (str): Name of the embedding model, part of every key.
+            dim (int): Embedding dimension.
+            cache_dir (str | Path): Directory holding the cache files.
+            memory_size (int): Maximum number of vectors kept in the in-memory LRU.
+            initial_capacity (int): Number of rows allocated when the vector file is created.
+        """
+        self.model_name = model_name
+        self.dim = dim
+        self.directory = Path(cache_dir)
+        self.memory_size = memory_size
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()
+        self._index = {}
+        self._vectors = None
+        self._generation = None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file_lock = FileLock(str(self.directory / "cache.lock"))
+        self._keys_path = self.directory / "keys.bin"
+        self._vectors_path = self.directory / "vectors.f32"
+        self._meta_path = self.directory / "meta.json"
+
+        with self._file_lock:
+            self._validate_meta()
+            if not self._vectors_path.exists():
+                self._resize_file(initial_capacity)
+            self._keys_path.touch()
+            self._refresh()
+
+    def _read_meta(self) -> dict:
+        if not self._meta_path.exists():
+            return {}
+        with open(self._meta_path, mode="rt", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_meta(self):
+        """Writes the meta file with a new generation, to be called whenever the cache files are recreated."""
+        meta = {"model_name": self.model_name, "dim": self.dim, "version": FORMAT_VERSION,
+                "generation": uuid.uuid4().hex}
+        with open(self._meta_path, mode="wt", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+    def _validate_meta(self):
+        """Wipes the cache files if they were written for another model, dimension or format."""
+        meta = self._read_meta()
+        expected = {"model_name": self.model_name, "dim": self.dim, "version": FORMAT_VERSION}
+        if meta and all(meta.get(name) == value for name, value in expected.items()):
+            if "generation" not in meta:
+                self._write_meta()
+            return
+
+        if meta:
+            print(f"Embedding cache in '{self.directory}' belongs to another model, invalidating it...")
+        for path in (self._keys_path, self._vectors_path):
+            if path.exists():
+                path.unlink()
+        self._write_meta()
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).digest()[:KEY_SIZE]
+
+    def _resize_file(self, rows: int):
+        with open(self._vectors_path, mode="ab") as file:
+            file.truncate(rows * self.dim * np.dtype(np.float32).itemsize)
+
+    def _capacity(self) -> int:
+        return self._vectors_path.stat().st_size // (self.dim * np.dtype(np.float32).itemsize)
+
+    def _remap(self):
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity(), self.dim))
+
+    def _refresh(self):
+        """
+        Picks up keys appended by other processes since the last read. If another process recreated the
+        cache files (a new generation, or a key file shorter than what was read), the index is reloaded
+        from the start. Must be called with the file lock held.
+        """
+        generation = self._read_meta().get("generation")
+        size = self._keys_path.stat().st_size
+        if generation != self._generation or size < len(self._index) * KEY_SIZE:
+            if self._generation is not None:
+                print(f"Embedding cache in '{self.directory}' was recreated by another process, reloading it...")
+            self._generation = generation
+            self._index.clear()
+            self._memory.clear()
+            self._vectors = None
+
+        offset = len(self._index) * KEY_SIZE
+        if size - offset >= KEY_SIZE:
+            with open(self._keys_path, mode="rb") as file:
+                file.seek(offset)
+                data = file.read((size - offset) // KEY_SIZE * KEY_SIZE)
+
+            for start in range(0, len(data), KEY_SIZE):
+                self._index.setdefault(data[start:start + KEY_SIZE], len(self._index))
+
+        if self._vectors is None or len(self._index) > self._vectors.shape[0]:
+            self._remap()
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, key: bytes):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            return vector
+
+        row = self._index.get(key)
+        if row is None:
+            return None
+
+        vector = np.array(self._vectors[row])
+        self._remember(key, vector)
+        return vector
+
+    def get_many(self, texts: List[str]) -> tuple[np.ndarray, List[int]]:
+        """
+        Looks up cached vectors for a list of texts.
+
+        Parameters:
+            texts (List[str]): Texts to look up.
+
+        Returns:
+            tuple[np.ndarray, List[int]]: Array of shape (len(texts), dim) with the cached rows filled in,
+            and the indices of the texts that were not found.
+        """
+        result = np.zeros((len(texts), self.dim), dtype=np.float32)
+        missing = []
+
+        with self._lock:
+            keys = [self._key(text) for text in texts]
+            refresh = any(key not in self._memory and key not in self._index for key in keys)
+            with self._file_lock if refresh else nullcontext():
+                if refresh:
+                    self._refresh()
+
+                for i, key in enumerate(keys):
+                    vector = self._lookup(key)
+                    if vector is None:
+                        missing.append(i)
+                    else:
+                        result[i] = vector
+
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        return result, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """
+        Stores vectors for a list of texts, both in memory and on disk.
+
+        Parameters:
+            texts (List[str]): Texts the vectors were computed for.
+            vectors (np.ndarray): Array of shape (len(texts), dim).
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+
+            new_keys = []
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                if key in self._index:
+                    continue
+
+                row = len(self._index)
+                if row >= self._vectors.shape[0]:
+                    self._vectors.flush()
+                    self._resize_file(max(2 * self._vectors.shape[0], row + 1))
+                    self._remap()
+
+                self._vectors[row] = vector
+                self._index[key] = row
+                new_keys.append(key)
+
+            if new_keys:
+                self._vectors.flush()
+                with open(self._keys_path, mode="ab") as file:
+                    file.write(b"".join(new_keys))
+
+    def embed(self, texts: List[str], embedder, batch_size: int = None) -> np.ndarray:
+        """
+        Returns embeddings for `texts`, computing only the ones missing from the cache.
+
+        Parameters:
+            texts (List[str]): Texts to embed.
+            embedder (TextEmbedder): Embedder used for cache misses.
+            batch_size (int): Batch size passed to the embedder.
+
+        Returns:
+            np.ndarray: Contiguous float32 array of shape (len(texts), dim).
+        """
+        result, missing = self.get_many(texts)
+        if not missing:
+            return result
+
+        # The model embeds the normalized text, the one the key is derived from, so a key always
+        # addresses the same vector whichever of its trivially different spellings was embedded first.
+        positions = {}
+        unique_texts = []
+        for i in missing:
+            key = self._key(texts[i])
+            if key not in positions:
+                positions[key] = len(unique_texts)
+                unique_texts.append(normalize_text(texts[i]))
+
+        computed = embedder.get_embedding(unique_texts, batch_size=batch_size)
+        self.put_many(unique_texts, computed)
+
+        for i in missing:
+            result[i] = computed[positions[self._key(texts[i])]]
+
+        return result
+
+    def clear(self):
+        """Removes every cached vector, in memory and on disk."""
+        with self._lock, self._file_lock:
+            self._memory.clear()
+            self._index.clear()
+            self._vectors = None
+            self._generation = None
+            for path in (self._keys_path, self._vectors_path):
+                path.unlink(missing_ok=True)
+            self._write_meta()
+            self._resize_file(1024)
+            self._keys_path.touch()
+            self._refresh()
+
+    def stats(self) -> dict:
+        """Returns hit, miss and eviction counters together with the cache sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._index)
+            }
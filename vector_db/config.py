@@ -12,6 +12,11 @@ with open("config.yaml", mode="rt") as file:
 # news api
 NEWS_API_ENDPOINT = os.getenv("NEWS_API_ENDPOINT")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
+NEWS_API_MAX_WORKERS = cfg["news_api"]["max_workers"]
+NEWS_API_REQUESTS_PER_SECOND = cfg["news_api"]["requests_per_second"]
+NEWS_API_BURST = cfg["news_api"]["burst"]
+NEWS_API_MAX_PAGES = cfg["news_api"]["max_pages"]
+NEWS_API_PAGE_CAPS = cfg["news_api"].get("page_caps") or {}
 
 # elasticsearch
 ES_HOST = os.getenv("ES_HOST")
@@ -21,3 +26,12 @@ ES_PASSWORD = os.getenv("ES_PASSWORD")
 
 # elastic specific
 TECH_NEWS_INDEX = cfg["elasticsearch"]["indicies"]["tech_news"]
+ETL_STATE_INDEX = cfg["elasticsearch"]["indicies"]["etl_state"]
+TECH_NEWS_ALIAS = cfg["elasticsearch"]["aliases"]["tech_news"]
+ROLLBACK_HOURS = cfg["elasticsearch"]["rollback_hours"]
+
+# etl
+RETENTION_DAYS = cfg["etl"]["retention_days"]
+BULK_CHUNK_SIZE = cfg["etl"]["bulk"]["chunk_size"]
+BULK_MAX_BYTES = cfg["etl"]["bulk"]["max_chunk_mb"] * 1024 * 1024
+BULK_THREADS = cfg["etl"]["bulk"]["threads"]
@@ -1,33 +1,146 @@
 import json
+from contextlib import nullcontext
+from itertools import count
 from pathlib import Path
+from typing import Iterable, Iterator, TextIO
 
 import ftfy
 from elasticsearch import Elasticsearch, helpers
 
-from index_management import create_index
+from db_management.index_management import rebuild_index
+from utils.elasitc_utils import bump_generation, document_id, ingest_mode, stream_load_documents
 
 
-def bulk_index(elastic_instance: Elasticsearch, data: list[dict] | Path, index_name: str, start_id: int = 0) -> None:
-    def preprocess_to_bulk(data: list[dict], index_name: str, start_id: int) -> list[dict]:
-        if isinstance(data, Path):
-            with open(data, mode="rt", encoding="utf-8") as file:
-                raw_data = file.read()
-                fixed_data = ftfy.fix_text(raw_data)
-                data = json.loads(fixed_data)
+def _fix_record(value):
+    """Applies ftfy to every string of a decoded record."""
+    if isinstance(value, str):
+        return ftfy.fix_text(value)
+    if isinstance(value, dict):
+        return {key: _fix_record(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fix_record(item) for item in value]
+    return value
 
-        docs = []
-        for n, doc in enumerate(data):
-            preprocessed_doc = {
-                "_index": index_name,
-                "_id": start_id + n,
-                "_source": doc
-            }
-            docs.append(preprocessed_doc)
-        return docs
 
-    processed_data = preprocess_to_bulk(data=data, index_name=index_name, start_id=start_id)
+def _iter_json_array(file: TextIO, first_chunk: str, buffer_size: int) -> Iterator[dict]:
+    """Incrementally decodes the elements of a JSON array, holding at most a few buffers in memory."""
+    decoder = json.JSONDecoder()
+    buffer = first_chunk
+    position = buffer.index("[") + 1
 
-    helpers.bulk(elastic_instance, processed_data)
+    while True:
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ","):
+            position += 1
+
+        if position == len(buffer):
+            buffer, position = file.read(buffer_size), 0
+            if not buffer:
+                raise ValueError("Unexpected end of file inside a JSON array.")
+            continue
+
+        if buffer[position] == "]":
+            return
+
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            more = file.read(buffer_size)
+            if not more:
+                raise
+            buffer, position = buffer[position:] + more, 0
+            continue
+
+        yield record
+
+        if position >= buffer_size:
+            buffer, position = buffer[position:], 0
+
+
+def iter_records(path: Path, buffer_size: int = 1024 * 1024) -> Iterator[dict]:
+    """
+    Streams records from an NDJSON file or a JSON array file, fixing their text with ftfy one record at a time.
+
+    Parameters:
+        path (Path): Path to the dump.
+        buffer_size (int): Number of characters read at once when parsing a JSON array.
+
+    Yields:
+        dict: The records of the dump.
+    """
+    with open(path, mode="rt", encoding="utf-8") as file:
+        first_chunk = file.read(buffer_size)
+        if first_chunk.lstrip().startswith("["):
+            records = _iter_json_array(file, first_chunk, buffer_size)
+        else:
+            file.seek(0)
+            records = (json.loads(line) for line in file if line.strip())
+
+        for record in records:
+            yield _fix_record(record)
+
+
+def bulk_index(elastic_instance: Elasticsearch, data: Iterable[dict] | Path, index_name: str, start_id: int = 0,
+               chunk_size: int = 500, max_chunk_bytes: int = 10 * 1024 * 1024, thread_count: int = 4,
+               full_load: bool = False, size_sample_every: int = 100) -> int:
+    """
+    Bulk loads documents, streaming them from a NDJSON or JSON array dump when `data` is a path,
+    so memory stays flat whatever the size of the dump. Documents keep the `_id` stored in their
+    record by `export_index`, or get the id the ETL derives from their URL, so a restored index is
+    upserted by the next update instead of duplicated. Only records with neither, from old dumps,
+    are given sequential ids from `start_id` on.
+    Client errors propagate, and a load with failed documents raises a RuntimeError.
+
+    Returns:
+        int: Number of indexed documents.
+    """
+    if isinstance(data, Path):
+        data = iter_records(data)
+
+    ids = count(start_id)
+
+    def record_id(doc: dict) -> str:
+        if "_id" in doc:
+            # `_id` is metadata and cannot be indexed as part of the source.
+            return doc.pop("_id")
+        if "url" in doc:
+            return document_id(doc)
+        return str(next(ids))
+
+    with ingest_mode(elastic_instance, index_name) if full_load else nullcontext():
+        indexed, failed = stream_load_documents(elastic_instance, index_name, data, chunk_size=chunk_size,
+                                                max_chunk_bytes=max_chunk_bytes, thread_count=thread_count,
+                                                id_fn=record_id, size_sample_every=size_sample_every)
+    if failed:
+        raise RuntimeError(f"{failed} documents failed to load into '{index_name}'.")
+    return indexed
+
+
+def export_index(elastic_instance: Elasticsearch, index_name: str, path: Path, batch_size: int = 1000,
+                 source_fields: list[str] = None) -> int:
+    """
+    Streams every document of an index into a NDJSON dump that `bulk_index` can load back. The `_id` of
+    each document is written into its record, so the dump restores under the same ids.
+
+    Parameters:
+        elastic_instance (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The index (or alias) to export.
+        path (Path): Path of the dump to write.
+        batch_size (int): Number of documents fetched per scroll request.
+        source_fields (list[str]): Fields to export, all fields when None.
+
+    Returns:
+        int: Number of exported documents.
+    """
+    exported = 0
+    with open(path, mode="wt", encoding="utf-8") as file:
+        for hit in helpers.scan(elastic_instance, index=index_name, size=batch_size, _source=source_fields or True,
+                                query={"query": {"match_all": {}}}):
+            file.write(json.dumps({"_id": hit["_id"], **hit["_source"]}, ensure_ascii=False))
+            file.write("\n")
+            exported += 1
+
+    print(f"Exported {exported} documents from '{index_name}' to '{path}'.")
+    return exported
 
 
 def delete_all_documents(elastic_instance: Elasticsearch, index_name: str) -> None:
@@ -38,12 +151,21 @@ def delete_all_documents(elastic_instance: Elasticsearch, index_name: str) -> No
     elastic_instance.delete_by_query(index=index_name, query=full_delete_query)
 
 
-def data_migration(elasitc_instance: Elasticsearch,
-                   source_index: str,
-                   target_index: str,
-                   mapping: dict | Path = None) -> None:
-
-    if mapping:
-        create_index(elastic_instance=elasitc_instance, index_name=target_index, mapping=mapping)
+def data_migration(elastic_instance: Elasticsearch,
+                   alias: str,
+                   mapping: dict | Path,
+                   rollback_hours: int = 48,
+                   state_index: str | None = None) -> str:
+    """
+    Copies the documents behind the alias into a new index with the given mapping and swaps the alias to it.
+    With `state_index`, the generation of the alias is bumped so retrievers drop results scored under the old mapping.
+    """
+    def reindex(new_index: str) -> None:
+        elastic_instance.options(request_timeout=3600).reindex(source={"index": alias}, dest={"index": new_index},
+                                                               wait_for_completion=True)
 
-    elasitc_instance.reindex(source={"index": source_index}, dest={"index": target_index})
+    new_index = rebuild_index(elastic_instance, alias=alias, mapping=mapping, load=reindex,
+                              rollback_hours=rollback_hours)
+    if state_index:
+        bump_generation(elastic_instance, state_index, alias)
+    return new_index
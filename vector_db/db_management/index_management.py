@@ -1,8 +1,12 @@
 import json
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Callable
 
 from elasticsearch import Elasticsearch
 
+INGEST_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
 
 def create_index(elastic_instance: Elasticsearch, index_name: str, mapping: dict | Path) -> None:
     if not elastic_instance.indices.exists(index=index_name):
@@ -21,3 +25,168 @@ def update_mapping(elastic_instance: Elasticsearch, index_name: str, mapping: di
             mapping = json.load(file)
 
     elastic_instance.indices.put_mapping(index=index_name, body=mapping)
+
+
+def _load_mapping(mapping: dict | Path) -> dict:
+    if isinstance(mapping, Path):
+        with open(mapping, mode="rt", encoding="utf-8") as file:
+            return json.load(file)
+    return mapping
+
+
+def get_alias_indices(elastic_instance: Elasticsearch, alias: str) -> list[str]:
+    """Returns the concrete indices the alias currently points to."""
+    if not elastic_instance.indices.exists_alias(name=alias):
+        return []
+    return list(elastic_instance.indices.get_alias(name=alias).keys())
+
+
+def create_versioned_index(elastic_instance: Elasticsearch, alias: str, mapping: dict | Path) -> str:
+    """
+    Creates a new index named after the alias and the current time, with refresh and replicas
+    disabled so that it can be bulk loaded quickly. The alias is not moved.
+
+    Returns:
+        str: The name of the new index.
+    """
+    index_name = f"{alias}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}"
+    mapping = _load_mapping(mapping)
+    body = {**mapping, "settings": {**mapping.get("settings", {}), **INGEST_SETTINGS}}
+
+    elastic_instance.indices.create(index=index_name, body=body)
+    print(f"Created index '{index_name}' for alias '{alias}'.")
+    return index_name
+
+
+def restore_search_settings(elastic_instance: Elasticsearch, index_name: str, replicas: int = 1,
+                            refresh_interval: str = "1s") -> None:
+    """Re-enables refresh and replicas on an index after its bulk load, then refreshes it."""
+    elastic_instance.indices.put_settings(index=index_name, settings={
+        "index": {"refresh_interval": refresh_interval, "number_of_replicas": replicas}
+    })
+    elastic_instance.indices.refresh(index=index_name)
+
+
+def get_vector_dims(elastic_instance: Elasticsearch, index_name: str, vector_field: str) -> int:
+    """Returns the `dims` of a dense_vector field, read from the index mapping."""
+    mapping = elastic_instance.indices.get_field_mapping(index=index_name, fields=vector_field)
+    for index_mapping in mapping.values():
+        field = index_mapping["mappings"].get(vector_field)
+        if field:
+            return field["mapping"][vector_field.rsplit(".", 1)[-1]]["dims"]
+    raise ValueError(f"Field '{vector_field}' is not mapped in index '{index_name}'.")
+
+
+def warm_up_index(elastic_instance: Elasticsearch, index_name: str, vector_field: str = "content_vector",
+                  dims: int = None) -> None:
+    """
+    Runs a lexical and a kNN search on the index so its first real queries do not pay for loading it.
+    The query vector width is read from the mapping of `vector_field` unless `dims` is given.
+    """
+    if dims is None:
+        dims = get_vector_dims(elastic_instance, index_name, vector_field)
+    elastic_instance.search(index=index_name, size=1, query={"match_all": {}})
+    elastic_instance.search(index=index_name, size=1, knn={
+        "field": vector_field,
+        "query_vector": [1.0 / dims ** 0.5] * dims,
+        "k": 1,
+        "num_candidates": 10
+    })
+
+
+def swap_alias(elastic_instance: Elasticsearch, alias: str, index_name: str) -> list[str]:
+    """
+    Atomically points the alias to `index_name` only.
+
+    Returns:
+        list[str]: The indices the alias pointed to before.
+    """
+    previous = get_alias_indices(elastic_instance, alias)
+    actions = [{"remove": {"index": old_index, "alias": alias}} for old_index in previous if old_index != index_name]
+    actions.append({"add": {"index": index_name, "alias": alias, "is_write_index": True}})
+
+    elastic_instance.indices.update_aliases(actions=actions)
+    print(f"Alias '{alias}' now points to '{index_name}' (previously {previous or 'nothing'}).")
+    return previous
+
+
+def delete_expired_indices(elastic_instance: Elasticsearch, alias: str, rollback_hours: int) -> list[str]:
+    """
+    Deletes versioned indices of the alias that are no longer aliased and are older than the rollback period.
+
+    Returns:
+        list[str]: The deleted indices.
+    """
+    live = set(get_alias_indices(elastic_instance, alias))
+    cutoff_ms = (datetime.now(timezone.utc).timestamp() - rollback_hours * 3600) * 1000
+    settings = elastic_instance.indices.get_settings(index=f"{alias}_*", name="index.creation_date",
+                                                     expand_wildcards="open")
+
+    expired = [
+        index_name for index_name, index_settings in settings.items()
+        if index_name not in live and int(index_settings["settings"]["index"]["creation_date"]) < cutoff_ms
+    ]
+    for index_name in expired:
+        elastic_instance.indices.delete(index=index_name)
+        print(f"Deleted index '{index_name}' after its rollback period.")
+    return expired
+
+
+def rollback_alias(elastic_instance: Elasticsearch, alias: str) -> str:
+    """
+    Points the alias back to the most recent versioned index that is not live.
+
+    Returns:
+        str: The index the alias now points to.
+    """
+    live = set(get_alias_indices(elastic_instance, alias))
+    candidates = sorted(index_name for index_name in elastic_instance.indices.get(index=f"{alias}_*") if index_name not in live)
+    if not candidates:
+        raise ValueError(f"No previous index available to roll alias '{alias}' back to.")
+
+    swap_alias(elastic_instance, alias, candidates[-1])
+    return candidates[-1]
+
+
+def rebuild_index(elastic_instance: Elasticsearch,
+                  alias: str,
+                  mapping: dict | Path,
+                  load: Callable[[str], None],
+                  replicas: int = 1,
+                  rollback_hours: int = 48,
+                  force_merge_segments: int = 1) -> str:
+    """
+    Blue/green rebuild: loads a fresh versioned index, warms it up and then swaps the alias to it
+    in one step, so readers of the alias never see an empty or half-filled index. The index is
+    loaded without refresh and replicas and force-merged before the replicas are created, so HNSW
+    graphs are built once per segment and copied instead of being rebuilt on every replica.
+
+    Parameters:
+        elastic_instance (Elasticsearch): The Elasticsearch client instance.
+        alias (str): The alias readers query.
+        mapping (dict | Path): Mapping of the new index.
+        load (Callable[[str], None]): Fills the new index, called with its name.
+        replicas (int): Number of replicas restored after the load.
+        rollback_hours (int): How long indices replaced by the swap are kept for a rollback.
+        force_merge_segments (int): Number of segments to merge down to after the load, None to skip merging.
+
+    Returns:
+        str: The name of the new index.
+    """
+    new_index = create_versioned_index(elastic_instance, alias=alias, mapping=mapping)
+    try:
+        load(new_index)
+        if force_merge_segments:
+            elastic_instance.indices.refresh(index=new_index)
+            elastic_instance.options(request_timeout=3600).indices.forcemerge(index=new_index,
+                                                                              max_num_segments=force_merge_segments)
+        restore_search_settings(elastic_instance, new_index, replicas=replicas)
+        warm_up_index(elastic_instance, new_index)
+    except Exception:
+        print(f"Rebuild of '{alias}' failed, deleting incomplete index '{new_index}'.")
+        elastic_instance.indices.delete(index=new_index)
+        raise
+
+    swap_alias(elastic_instance, alias, new_index)
+    delete_expired_indices(elastic_instance, alias, rollback_hours=rollback_hours)
+    return new_index
@@ -1,7 +1,16 @@
 """This module implements the data extraction logic for the News API."""
-import requests
+import math
+import queue
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
 
 # List of tech topics to retrieve news for
 TOPICS = [
@@ -62,61 +71,277 @@ TOPICS = [
 
 ONE_WEEK_AGO = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
 
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+PAGE_SIZE = 100
+
+_WORKER_DONE = object()
+
+
+class ExtractionStopped(Exception):
+    """Raised inside a worker once the consumer of the extracted articles has stopped reading."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        Thread-safe token bucket rate limiter.
+
+        Parameters:
+            rate (float): Tokens added per second, i.e. the sustained request rate.
+            capacity (int): Maximum number of tokens, i.e. the allowed burst size.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, stop: threading.Event = None) -> bool:
+        """
+        Blocks until a token is available and consumes it.
+
+        Returns:
+            bool: True once a token is consumed, False if `stop` was set while waiting.
+        """
+        while True:
+            if stop is not None and stop.is_set():
+                return False
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class UrlDeduplicator:
+    """Thread-safe set of article URLs shared by all extraction workers."""
+
+    def __init__(self):
+        self.seen_urls = set()
+        self.lock = threading.Lock()
 
-def get_tech_news(endpoint: str, api_key: str, from_date: str, to_date: str, topics: list[str] = TOPICS,  delay: int = 2) -> list[dict]:
+    def add(self, url: str) -> bool:
+        """Registers the URL and returns True if it was not seen before."""
+        with self.lock:
+            if url in self.seen_urls:
+                return False
+            self.seen_urls.add(url)
+            return True
+
+
+def create_session(api_key: str, pool_size: int = 16) -> requests.Session:
+    """Creates a keep-alive HTTP session authorised for the News API."""
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Bearer {api_key}"})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    """Parses the Retry-After header, given either in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(tz=retry_at.tzinfo)).total_seconds())
+
+
+def fetch_json(session: requests.Session, endpoint: str, params: dict, rate_limiter: TokenBucket,
+               max_retries: int = 5, backoff: float = 1.0, timeout: float = 30, stop: threading.Event = None) -> dict:
+    """
+    Sends a rate-limited GET request, retrying on 429/5xx responses and connection errors.
+
+    Retries wait for the server's Retry-After when given, otherwise for an exponential backoff with full jitter.
+    Raises `ExtractionStopped` instead of sending a request once `stop` is set.
     """
-    Extracts tech news data from the News API for each specified topic in the past week,
-    with deduplication based on article URLs.
+    for attempt in range(max_retries + 1):
+        if not rate_limiter.acquire(stop):
+            raise ExtractionStopped()
+        try:
+            response = session.get(endpoint, params=params, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == max_retries:
+                raise
+            time.sleep(random.uniform(0, backoff * 2 ** attempt))
+            continue
+
+        if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+            wait = _retry_after(response)
+            if wait is None:
+                wait = random.uniform(0, backoff * 2 ** attempt)
+            print(f"News API responded with {response.status_code}, retrying in {wait:.1f}s...")
+            time.sleep(wait)
+            continue
+
+        response.raise_for_status()
+        return response.json()
+
+
+def iter_topic_pages(session: requests.Session, endpoint: str, topic: str, from_date: str, to_date: str,
+                     rate_limiter: TokenBucket, deduplicator: UrlDeduplicator, max_pages: int = 5,
+                     stop: threading.Event = None) -> Iterator[list[dict]]:
     """
-    headers = {
-        "Authorization": f"Bearer {api_key}"
-    }
-    all_articles = []
-    seen_urls = set()
+    Pages through the results for one (topic, date range) pair, following `totalResults` up to `max_pages`.
+    Stops without sending further requests once `stop` is set.
 
-    for topic in topics:
-        print(f"Requesting news data for topic '{topic}' from News API starting from {from_date}...")
+    Yields:
+        list[dict]: Articles of one page whose URLs were not seen by any other worker.
+    """
+    print(f"Requesting news data for topic '{topic}' from News API starting from {from_date}...")
 
+    page = 1
+    total_pages = max_pages
+    while page <= total_pages:
+        if stop is not None and stop.is_set():
+            return
         params = {
             "q": topic,
             "from": from_date,
             "to": to_date,
             "sortBy": "relevance",
             "language": "en",
-            "pageSize": 100,
-            "page": 1
+            "pageSize": PAGE_SIZE,
+            "page": page
         }
 
         try:
-            response = requests.get(endpoint, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-            articles = data.get("articles", [])
-            print(f"Retrieved {len(articles)} articles for topic '{topic}'.")
-
-            for article in articles:
-                if article["url"] not in seen_urls:
-                    seen_urls.add(article["url"])
-                    article["topic"] = topic
-                    all_articles.append(article)
-                else:
-                    print(f"Duplicate article detected and skipped: {article['title']}, url: {article['url']}")
-
+            data = fetch_json(session, endpoint, params, rate_limiter, stop=stop)
+        except ExtractionStopped:
+            return
         except requests.exceptions.HTTPError as http_err:
-            print(f"HTTP error occurred while fetching topic '{topic}': {http_err}")
+            print(f"HTTP error occurred while fetching topic '{topic}' (page {page}): {http_err}")
+            return
         except requests.exceptions.ConnectionError:
             print(f"Error: Unable to connect to the News API for topic '{topic}'.")
+            return
         except requests.exceptions.Timeout:
             print(f"Error: The request to News API timed out for topic '{topic}'.")
+            return
         except requests.exceptions.RequestException as err:
             print(f"An error occurred while fetching topic '{topic}': {err}")
+            return
         except ValueError:
             print(f"Error: Failed to parse JSON response for topic '{topic}'.")
+            return
+
+        articles = data.get("articles", [])
+        total_pages = min(max_pages, math.ceil(data.get("totalResults", 0) / PAGE_SIZE))
+        print(f"Retrieved {len(articles)} articles for topic '{topic}' (page {page}/{total_pages}).")
+
+        new_articles = []
+        for article in articles:
+            if deduplicator.add(article["url"]):
+                article["topic"] = topic
+                new_articles.append(article)
+            else:
+                print(f"Duplicate article detected and skipped: {article['title']}, url: {article['url']}")
+        yield new_articles
+
+        if not articles:
+            return
+        page += 1
+
+
+def _put(pages: queue.Queue, item, stop: threading.Event) -> bool:
+    """Puts an item on the queue, giving up once the consumer has stopped reading."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iter_news(endpoint: str, api_key: str, date_ranges: list[tuple[str, str]], topics: list[str] = TOPICS,
+              max_workers: int = 8, requests_per_second: float = 2.0, burst: int = 4, max_pages: int = 5,
+              page_caps: dict[str, int] = None, queue_size: int = 32) -> Iterator[dict]:
+    """
+    Extracts news for every (topic, date range) pair concurrently and yields articles as pages arrive.
+
+    All workers share one keep-alive session, one token bucket sized to the News API quota
+    and one URL deduplicator. Pages are handed over through a bounded queue, so workers pause
+    when the consumer falls behind.
+
+    Parameters:
+        endpoint (str): The News API endpoint.
+        api_key (str): The News API key.
+        date_ranges (list[tuple[str, str]]): (from_date, to_date) windows to query.
+        topics (list[str]): Topic queries.
+        max_workers (int): Number of concurrent requests in flight.
+        requests_per_second (float): Sustained request rate allowed by the News API quota.
+        burst (int): Number of requests that may be sent at once before the rate applies.
+        max_pages (int): Default maximum number of pages fetched per (topic, date range).
+        page_caps (dict[str, int]): Per-topic overrides of `max_pages`.
+        queue_size (int): Maximum number of fetched pages waiting for the consumer.
+
+    Yields:
+        dict: Deduplicated articles tagged with their topic.
+    """
+    page_caps = page_caps or {}
+    rate_limiter = TokenBucket(rate=requests_per_second, capacity=burst)
+    deduplicator = UrlDeduplicator()
+    pages = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
 
-        time.sleep(delay)
+    def worker(session: requests.Session, topic: str, from_date: str, to_date: str):
+        if stop.is_set():
+            return
+        try:
+            for page in iter_topic_pages(session, endpoint, topic, from_date, to_date, rate_limiter,
+                                         deduplicator, page_caps.get(topic, max_pages), stop):
+                if not _put(pages, page, stop):
+                    return
+        except Exception as err:
+            print(f"Unexpected error while extracting topic '{topic}' from {from_date}: {err}")
+        finally:
+            _put(pages, _WORKER_DONE, stop)
+
+    total = 0
+    with create_session(api_key, pool_size=max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        remaining = 0
+        for from_date, to_date in date_ranges:
+            for topic in topics:
+                executor.submit(worker, session, topic, from_date, to_date)
+                remaining += 1
+
+        try:
+            while remaining:
+                page = pages.get()
+                if page is _WORKER_DONE:
+                    remaining -= 1
+                    continue
+                total += len(page)
+                yield from page
+        finally:
+            # Workers that have not started are dropped, running ones return before their next request.
+            stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
 
-    print(f"Total articles retrieved after deduplication: {len(all_articles)}")
-    return all_articles
+    print(f"Total articles retrieved after deduplication: {total}")
+
+
+def get_tech_news(endpoint: str, api_key: str, from_date: str, to_date: str, topics: list[str] = TOPICS,
+                  **extract_options) -> Iterator[dict]:
+    """
+    Extracts tech news data from the News API for each specified topic in the given date range,
+    with deduplication based on article URLs. Articles are yielded as their pages arrive.
+    """
+    yield from iter_news(endpoint, api_key, [(from_date, to_date)], topics=topics, **extract_options)
 
 
 def iterate_days(one_week_ago: str = ONE_WEEK_AGO) -> list[tuple[str, str]]:
@@ -129,15 +354,28 @@ def iterate_days(one_week_ago: str = ONE_WEEK_AGO) -> list[tuple[str, str]]:
     return dates
 
 
-def recent_week_etl(endpoint: str, api_key: str, delay: int = 2) -> list[dict]:
-    """
-    Extracts tech news data from the News API for the past week for each topic.
-    """
-    all_articles = []
-    date_ranges = iterate_days()
+def iterate_windows(since: datetime, until: datetime = None) -> list[tuple[str, str]]:
+    """Splits the time between `since` and `until` (default: now) into windows of at most one day."""
+    until = until or datetime.now(since.tzinfo)
+    windows = []
+    start = since
+    while start < until:
+        end = min(start + timedelta(days=1), until)
+        windows.append((start.strftime('%Y-%m-%dT%H:%M:%S'), end.strftime('%Y-%m-%dT%H:%M:%S')))
+        start = end
+    return windows
+
 
-    for from_date, to_date in date_ranges:
-        articles = get_tech_news(endpoint, api_key, from_date, to_date, delay=delay)
-        all_articles.extend(articles)
+def extract_news(endpoint: str, api_key: str, date_ranges: list[tuple[str, str]], topics: list[str] = TOPICS,
+                 **extract_options) -> list[dict]:
+    """Collects the output of `iter_news` into a list."""
+    return list(iter_news(endpoint, api_key, date_ranges, topics=topics, **extract_options))
 
-    return all_articles
+
+def recent_week_etl(endpoint: str, api_key: str, date_ranges: list[tuple[str, str]] = None,
+                    **extract_options) -> Iterator[dict]:
+    """
+    Extracts tech news data from the News API for the past week (or the given date ranges) for each topic,
+    yielding articles while later pages are still being fetched.
+    """
+    yield from iter_news(endpoint, api_key, date_ranges or iterate_days(), **extract_options)
@@ -3,4 +3,5 @@ This module implements imports from the ElasticSearch utilities.
 Just for modularization purposes, the imports are moved to the load.py file.
 """
 
-from utils.elasitc_utils import bulk_load_documents
+from utils.elasitc_utils import (bulk_load_documents, stream_load_documents, filter_unchanged, get_etl_state,
+                                 save_etl_state, latest_published_at, delete_older_than, bump_generation)
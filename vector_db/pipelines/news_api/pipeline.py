@@ -1,27 +1,181 @@
 """This module orchestrates the ETL process for the News API data."""
+import queue
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
 from elasticsearch import Elasticsearch
 
-from pipelines.news_api.extract import recent_week_etl
-from pipelines.news_api.transform import transform_data
-from pipelines.news_api.load import bulk_load_documents
+from db_management.index_management import rebuild_index
+from pipelines.news_api.extract import recent_week_etl, iterate_windows
+from pipelines.news_api.transform import transform_batch, embedding_cache, document_id, content_hash
+from pipelines.news_api.load import (stream_load_documents, filter_unchanged, get_etl_state, save_etl_state,
+                                     latest_published_at, delete_older_than, bump_generation)
+from pipelines.streaming import Channel, ChannelClosed, StageStats, start_stage
 
 
-def run_etl(news_endpoint: str, news_api_key: str, es_instance: Elasticsearch, index_name: str):
-    news_data = recent_week_etl(endpoint=news_endpoint, api_key=news_api_key)
-    transformed_data = [transform_data(news) for news in news_data]
-    bulk_load_documents(es=es_instance, index_name=index_name, documents=transformed_data)
+def run_etl(news_endpoint: str, news_api_key: str, es_instance: Elasticsearch, index_name: str,
+            chunk_size: int = 256, batch_size: int = 64, extract_options: dict = None, queue_size: int = 1024,
+            linger_seconds: float = 2.0, bulk_chunk_size: int = 500, bulk_max_bytes: int = 10 * 1024 * 1024,
+            bulk_threads: int = 1,
+            date_ranges: list[tuple[str, str]] = None, skip_unchanged: bool = False) -> dict[str, StageStats]:
+    """
+    Runs extract, batch-embed and load as concurrent stages joined by bounded queues, so the network
+    and the CPU are busy at the same time and memory does not grow with the size of the corpus.
+    Documents are indexed under an id derived from their URL, so re-ingested articles are overwritten.
+    A RuntimeError is raised if any document failed to load, so no watermark is saved and no alias is swapped.
 
+    Parameters:
+        news_endpoint (str): The News API endpoint.
+        news_api_key (str): The News API key.
+        es_instance (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The name of the Elasticsearch index.
+        chunk_size (int): Number of articles embedded together by the transform stage.
+        batch_size (int): Number of texts per embedding forward pass.
+        extract_options (dict): Keyword arguments passed to `recent_week_etl`.
+        queue_size (int): Capacity of each queue between stages, in documents.
+        linger_seconds (float): How long the transform stage waits to fill a chunk before embedding a partial one.
+        bulk_chunk_size (int): Maximum number of documents per bulk request.
+        bulk_max_bytes (int): Maximum payload size of a bulk request.
+        bulk_threads (int): Number of bulk requests sent in parallel.
+        date_ranges (list[tuple[str, str]]): Windows to extract, defaults to the past week.
+        skip_unchanged (bool): Skip embedding and loading articles already indexed with the same content hash.
+
+    Returns:
+        dict[str, StageStats]: Throughput and backpressure statistics of each stage.
+    """
+    stats = {name: StageStats(name) for name in ("extract", "transform", "load")}
+    articles = Channel(maxsize=queue_size)
+    documents = Channel(maxsize=queue_size)
+
+    def extract():
+        for article in recent_week_etl(endpoint=news_endpoint, api_key=news_api_key, date_ranges=date_ranges,
+                                       **(extract_options or {})):
+            articles.put(article, stats["extract"])
+            stats["extract"].items += 1
+
+    def transform():
+        closed = False
+        while not closed:
+            try:
+                chunk = [articles.get(stats["transform"])]
+            except ChannelClosed:
+                return
+            try:
+                while len(chunk) < chunk_size:
+                    chunk.append(articles.get(stats["transform"], timeout=linger_seconds))
+            except queue.Empty:
+                pass
+            except ChannelClosed:
+                closed = True
+
+            started = time.perf_counter()
+            if skip_unchanged:
+                changed = filter_unchanged(es_instance, index_name, chunk, id_fn=document_id, hash_fn=content_hash)
+                print(f"Skipping {len(chunk) - len(changed)} unchanged articles.")
+                chunk = changed
+            transformed = transform_batch(chunk, batch_size=batch_size)
+            stats["transform"].busy_seconds += time.perf_counter() - started
+            for doc in transformed:
+                documents.put(doc, stats["transform"])
+            stats["transform"].items += len(transformed)
+
+    def counted(docs):
+        for doc in docs:
+            stats["load"].items += 1
+            yield doc
+
+    start_stage(extract, articles, stats["extract"])
+    start_stage(transform, documents, stats["transform"])
 
-def run_etl_update(news_endpoint: str, news_api_key: str, es_instance: Elasticsearch, index_name: str):
-    print(f"Clearing existing data from index '{index_name}'...")
     try:
-        es_instance.delete_by_query(index=index_name, body={"query": {"match_all": {}}})
-        print(f"Index '{index_name}' cleared successfully.")
-    except Exception as e:
-        print(f"Failed to clear index '{index_name}': {e}")
-        return
-
-    print("Re-ingesting fresh data...")
-    run_etl(news_endpoint=news_endpoint, news_api_key=news_api_key, es_instance=es_instance, index_name=index_name)
-    print(f"Index '{index_name}' updated with fresh data.")
+        _, failed = stream_load_documents(es=es_instance, index_name=index_name,
+                                          documents=counted(documents.iterate(stats["load"])),
+                                          chunk_size=bulk_chunk_size, max_chunk_bytes=bulk_max_bytes,
+                                          thread_count=bulk_threads, id_fn=document_id)
+    finally:
+        articles.cancel()
+        documents.cancel()
+        stats["load"].finished_at = time.perf_counter()
+
+    for stage in stats.values():
+        print(stage.report())
+    print(f"Embedding cache stats: {embedding_cache.stats()}")
+    if failed:
+        raise RuntimeError(f"{failed} documents failed to load into '{index_name}'.")
+    return stats
+
+
+def run_etl_update(news_endpoint: str, news_api_key: str, es_instance: Elasticsearch, index_name: str,
+                   state_index: str = "etl_state", retention_days: int = 7, overlap_hours: int = 1, **etl_options):
+    """
+    Incrementally updates the index instead of wiping and re-ingesting it.
+
+    Only windows newer than the stored publishedAt watermark are extracted, articles whose content
+    hash has not changed are neither re-embedded nor re-loaded, and articles older than the retention
+    window are expired with a single range delete. The generation of the index is bumped afterwards,
+    so retrievers drop the results they cached before the update.
+
+    Parameters:
+        news_endpoint (str): The News API endpoint.
+        news_api_key (str): The News API key.
+        es_instance (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The name of the Elasticsearch index.
+        state_index (str): The index holding the stored watermark and generation.
+        retention_days (int): Number of days of articles to keep.
+        overlap_hours (int): How far before the watermark to start, to catch articles the News API indexed late.
+        **etl_options: Keyword arguments passed to `run_etl`.
+    """
+    now = datetime.now(timezone.utc)
+    watermark = get_etl_state(es_instance, state_index, index_name).get("watermark")
+    if watermark:
+        since = datetime.fromisoformat(watermark.replace("Z", "+00:00")) - timedelta(hours=overlap_hours)
+        print(f"Updating index '{index_name}' with articles published since {since.isoformat()}...")
+    else:
+        since = now - timedelta(days=retention_days)
+        print(f"No watermark stored for index '{index_name}', ingesting the last {retention_days} days...")
+
+    run_etl(news_endpoint=news_endpoint, news_api_key=news_api_key, es_instance=es_instance, index_name=index_name,
+            date_ranges=iterate_windows(since, now), skip_unchanged=True, **etl_options)
+
+    es_instance.indices.refresh(index=index_name)
+    latest = latest_published_at(es_instance, index_name)
+    if latest:
+        save_etl_state(es_instance, state_index, index_name, watermark=latest)
+
+    delete_older_than(es_instance, index_name, retention_days)
+    bump_generation(es_instance, state_index, index_name)
+    print(f"Index '{index_name}' updated, watermark is now {latest}.")
+
+
+def run_etl_rebuild(news_endpoint: str, news_api_key: str, es_instance: Elasticsearch, alias: str,
+                    mapping: dict | Path, state_index: str = "etl_state", rollback_hours: int = 48, **etl_options) -> str:
+    """
+    Full re-ingest into a fresh versioned index, which replaces the one behind `alias` only once it is
+    loaded and warmed up. The previous index is kept for `rollback_hours`. The generation of the alias
+    is bumped once it points to the new index.
+
+    Parameters:
+        news_endpoint (str): The News API endpoint.
+        news_api_key (str): The News API key.
+        es_instance (Elasticsearch): The Elasticsearch client instance.
+        alias (str): The alias the retriever reads from.
+        mapping (dict | Path): Mapping of the new index.
+        state_index (str): The index holding the stored watermark and generation.
+        rollback_hours (int): How long the replaced index is kept.
+        **etl_options: Keyword arguments passed to `run_etl`.
+
+    Returns:
+        str: The name of the new index.
+    """
+    def load(new_index: str) -> None:
+        run_etl(news_endpoint=news_endpoint, news_api_key=news_api_key, es_instance=es_instance,
+                index_name=new_index, **etl_options)
+
+    new_index = rebuild_index(es_instance, alias=alias, mapping=mapping, load=load, rollback_hours=rollback_hours)
+
+    latest = latest_published_at(es_instance, alias)
+    if latest:
+        save_etl_state(es_instance, state_index, alias, watermark=latest)
+    bump_generation(es_instance, state_index, alias)
+    return new_index
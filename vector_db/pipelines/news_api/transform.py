@@ -1,17 +1,30 @@
+import hashlib
 import sys
 import os
 
+import numpy as np
+
 sys.path.append(os.path.abspath("../models/huggingface"))  # noqa
 
 from embedding import TextEmbedder
+from embedding_cache import EmbeddingCache
+from utils.elasitc_utils import document_id  # noqa: F401, re-exported for the pipeline
 
 embedder = TextEmbedder()
+embedding_cache = EmbeddingCache(model_name=embedder.model_name, dim=embedder.dim)
 
+EMBEDDED_FIELDS = ("content", "description", "title")
 
-def transform_data(news_data: dict) -> dict:
-    """Transforms news data by generating embeddings for specified fields."""
 
-    transformed_data = {
+def content_hash(doc: dict) -> str:
+    """Hashes the embedded fields of an article (raw or transformed), used to skip re-embedding unchanged articles."""
+    content = "\0".join(doc.get(field) or "" for field in EMBEDDED_FIELDS)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _base_document(news_data: dict) -> dict:
+    """Maps a raw News API article onto the fields stored in the index."""
+    return {
         "author": news_data.get("author"),
         "content": news_data.get("content"),
         "description": news_data.get("description"),
@@ -19,17 +32,59 @@ def transform_data(news_data: dict) -> dict:
         "source_name": news_data["source"].get("name") if news_data.get("source") else None,
         "title": news_data.get("title", "Untitled"),
         "url": news_data.get("url"),
-        "topic": news_data.get("topic")
+        "topic": news_data.get("topic"),
+        "content_hash": content_hash(news_data)
     }
-    print("Transforming: ", transformed_data["title"])
 
-    if transformed_data["content"]:
-        transformed_data["content_vector"] = embedder.get_embedding(transformed_data["content"])[0]
 
-    if transformed_data["description"]:
-        transformed_data["description_vector"] = embedder.get_embedding(transformed_data["description"])[0]
+def transform_data(news_data: dict) -> dict:
+    """Transforms news data by generating embeddings for specified fields."""
+    return transform_batch([news_data])[0]
+
+
+def transform_batch(articles: list[dict], batch_size: int = 64) -> list[dict]:
+    """
+    Transforms a chunk of news articles, embedding the title, description and content
+    of all of them together in batched forward passes. Texts already in the embedding
+    cache are not embedded again.
+
+    Parameters:
+        articles (list[dict]): Raw articles as returned by the News API.
+        batch_size (int): Number of texts per embedding forward pass.
+
+    Returns:
+        list[dict]: Transformed documents, in the same order as `articles`.
+    """
+    documents = [_base_document(article) for article in articles]
+
+    targets = []
+    texts = []
+    for n, doc in enumerate(documents):
+        for field in EMBEDDED_FIELDS:
+            if doc[field]:
+                targets.append((n, f"{field}_vector"))
+                texts.append(doc[field])
+
+    print(f"Transforming {len(documents)} articles ({len(texts)} fields to embed)...")
+
+    vectors = embedding_cache.embed(texts, embedder, batch_size=batch_size)
+    for (n, vector_field), vector in zip(targets, vectors):
+        documents[n][vector_field] = vector.tolist()
+
+    if targets:
+        doc_vectors = _combine_vectors(vectors, [n for n, _ in targets], len(documents))
+        for n in {n for n, _ in targets}:
+            documents[n]["doc_vector"] = doc_vectors[n].tolist()
+
+    return documents
 
-    if transformed_data["title"]:
-        transformed_data["title_vector"] = embedder.get_embedding(transformed_data["title"])[0]
 
-    return transformed_data
+def _combine_vectors(vectors: np.ndarray, doc_indices: list[int], n_docs: int) -> np.ndarray:
+    """
+    Combines the field vectors of each document into one `doc_vector`: the normalised mean of the
+    normalised field vectors, so a single kNN search can cover title, description and content.
+    """
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    sums = np.zeros((n_docs, vectors.shape[1]), dtype=np.float32)
+    np.add.at(sums, doc_indices, unit)
+    return sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
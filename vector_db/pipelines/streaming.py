@@ -0,0 +1,126 @@
+"""This module implements the building blocks of a streaming pipeline: bounded channels between stages and per-stage metrics."""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+_CLOSED = object()
+
+
+class ChannelClosed(Exception):
+    """Raised by `Channel.get` once the producer has closed the channel."""
+
+
+@dataclass
+class StageStats:
+    """Throughput and backpressure counters of a single pipeline stage."""
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    waiting_upstream_seconds: float = 0.0
+    blocked_downstream_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> str:
+        return (f"[{self.name}] {self.items} items in {self.elapsed:.1f}s ({self.throughput:.1f} items/s), "
+                f"waiting on upstream {self.waiting_upstream_seconds:.1f}s, "
+                f"blocked by downstream {self.blocked_downstream_seconds:.1f}s")
+
+
+class Channel:
+    def __init__(self, maxsize: int):
+        """
+        Bounded queue connecting two pipeline stages.
+
+        A producer blocks when the channel is full, which is recorded as backpressure on its stage.
+        Failures are propagated to the consumer when the producer closes the channel with an error.
+
+        Parameters:
+            maxsize (int): Maximum number of items waiting in the channel.
+        """
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.cancelled = threading.Event()
+        self.error = None
+
+    def put(self, item, stats: StageStats) -> None:
+        """Puts an item, accounting the time spent waiting for free space to `stats`."""
+        started = time.perf_counter()
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        stats.blocked_downstream_seconds += time.perf_counter() - started
+        if self.cancelled.is_set():
+            raise RuntimeError("Downstream stage stopped consuming.")
+
+    def close(self, error: Exception = None) -> None:
+        """Marks the end of the stream, optionally because the producer failed."""
+        self.error = error
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(_CLOSED, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def cancel(self) -> None:
+        """Called by the consumer to release a producer blocked on a full channel."""
+        self.cancelled.set()
+
+    def get(self, stats: StageStats, timeout: float = None):
+        """
+        Gets the next item, accounting the time spent waiting to `stats`.
+
+        Raises:
+            queue.Empty: If no item arrived within `timeout`.
+            ChannelClosed: If the channel was closed.
+        """
+        started = time.perf_counter()
+        try:
+            item = self.queue.get(timeout=timeout)
+        finally:
+            stats.waiting_upstream_seconds += time.perf_counter() - started
+        if item is _CLOSED:
+            if self.error is not None:
+                raise RuntimeError("Upstream stage failed.") from self.error
+            raise ChannelClosed
+        return item
+
+    def iterate(self, stats: StageStats) -> Iterator:
+        """Yields items until the channel is closed."""
+        while True:
+            try:
+                yield self.get(stats)
+            except ChannelClosed:
+                return
+
+
+def start_stage(target: Callable[[], None], output: Channel, stats: StageStats) -> threading.Thread:
+    """
+    Runs a producer stage in a background thread and closes its output channel when it finishes or fails.
+    """
+    def run():
+        try:
+            target()
+            output.close()
+        except Exception as e:
+            print(f"[{stats.name}] Stage failed: {e}")
+            output.close(error=e)
+        finally:
+            stats.finished_at = time.perf_counter()
+
+    thread = threading.Thread(target=run, name=stats.name, daemon=True)
+    thread.start()
+    return thread
@@ -1,9 +1,35 @@
-"""Runner file for pipelines"""
+"""Runner file for pipelines. Pass `update` to run an incremental update instead of a full blue/green rebuild."""
+import sys
+from pathlib import Path
 
-from config import ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, TECH_NEWS_INDEX, NEWS_API_ENDPOINT, NEWS_API_KEY
-from pipelines.news_api.pipeline import run_etl
+from config import (ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, TECH_NEWS_ALIAS, NEWS_API_ENDPOINT, NEWS_API_KEY,
+                    NEWS_API_MAX_WORKERS, NEWS_API_REQUESTS_PER_SECOND, NEWS_API_BURST, NEWS_API_MAX_PAGES,
+                    NEWS_API_PAGE_CAPS, ETL_STATE_INDEX, RETENTION_DAYS, ROLLBACK_HOURS, BULK_CHUNK_SIZE,
+                    BULK_MAX_BYTES, BULK_THREADS)
+from pipelines.news_api.pipeline import run_etl_rebuild, run_etl_update
 from utils.elasitc_utils import connect_to_es
 
 es = connect_to_es(ES_HOST, ES_PORT, ES_USER, ES_PASSWORD)
 
-run_etl(news_endpoint=NEWS_API_ENDPOINT, news_api_key=NEWS_API_KEY, es_instance=es, index_name=TECH_NEWS_INDEX)
+extract_options = {
+    "max_workers": NEWS_API_MAX_WORKERS,
+    "requests_per_second": NEWS_API_REQUESTS_PER_SECOND,
+    "burst": NEWS_API_BURST,
+    "max_pages": NEWS_API_MAX_PAGES,
+    "page_caps": NEWS_API_PAGE_CAPS
+}
+
+load_options = {
+    "bulk_chunk_size": BULK_CHUNK_SIZE,
+    "bulk_max_bytes": BULK_MAX_BYTES,
+    "bulk_threads": BULK_THREADS
+}
+
+if len(sys.argv) > 1 and sys.argv[1] == "update":
+    run_etl_update(news_endpoint=NEWS_API_ENDPOINT, news_api_key=NEWS_API_KEY, es_instance=es,
+                   index_name=TECH_NEWS_ALIAS, state_index=ETL_STATE_INDEX, retention_days=RETENTION_DAYS,
+                   extract_options=extract_options, **load_options)
+else:
+    run_etl_rebuild(news_endpoint=NEWS_API_ENDPOINT, news_api_key=NEWS_API_KEY, es_instance=es, alias=TECH_NEWS_ALIAS,
+                    mapping=Path("db_management/schemas/news_articles_mapping.json"), state_index=ETL_STATE_INDEX,
+                    rollback_hours=ROLLBACK_HOURS, extract_options=extract_options, **load_options)
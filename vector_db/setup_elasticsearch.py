@@ -1,10 +1,12 @@
-"""Module is used for database setup from python code. It creates index (table) in Elasticsearch with mapping (schema)."""
+"""Module is used for database setup from python code. It creates index (table) in Elasticsearch with mapping (schema)
+and points the read alias to it. An existing unversioned index is adopted by the alias instead."""
 from pathlib import Path
 
 from elasticsearch import Elasticsearch
 
-from config import ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, TECH_NEWS_INDEX
-from db_management.index_management import create_index
+from config import ES_HOST, ES_PORT, ES_USER, ES_PASSWORD, TECH_NEWS_INDEX, TECH_NEWS_ALIAS
+from db_management.index_management import (create_versioned_index, get_alias_indices, restore_search_settings,
+                                            swap_alias)
 
 es = Elasticsearch(
     hosts=[{"host": ES_HOST,
@@ -17,4 +19,10 @@ es = Elasticsearch(
 
 path_to_mapping = Path("db_management/schemas/news_articles_mapping.json")
 
-create_index(elastic_instance=es, index_name=TECH_NEWS_INDEX, mapping=path_to_mapping)
+if not get_alias_indices(es, TECH_NEWS_ALIAS):
+    if es.indices.exists(index=TECH_NEWS_INDEX):
+        swap_alias(es, TECH_NEWS_ALIAS, TECH_NEWS_INDEX)
+    else:
+        index_name = create_versioned_index(elastic_instance=es, alias=TECH_NEWS_ALIAS, mapping=path_to_mapping)
+        restore_search_settings(es, index_name)
+        swap_alias(es, TECH_NEWS_ALIAS, index_name)
@@ -1,4 +1,14 @@
 """This module implements the ElasticSearch utilities."""
+import hashlib
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Callable, Iterable
+
+try:
+    from orjson import dumps
+except ImportError:
+    from json import dumps
 
 from elasticsearch import Elasticsearch, RequestError, ConnectionError, TransportError, helpers
 
@@ -23,6 +33,11 @@ def connect_to_es(host: str, port: int, user: str, password: str) -> Elasticsear
     )
 
 
+def document_id(doc: dict) -> str:
+    """Derives a deterministic document id from the article URL, so re-ingesting an article overwrites it."""
+    return hashlib.sha1(doc["url"].encode("utf-8")).hexdigest()
+
+
 def load_document(es: Elasticsearch, index_name: str, document: dict) -> bool:
     """
     Load a single document to the specified Elasticsearch index.
@@ -50,31 +65,63 @@ def load_document(es: Elasticsearch, index_name: str, document: dict) -> bool:
     return False
 
 
-def bulk_load_documents(es: Elasticsearch, index_name: str, documents: list[dict]) -> bool:
+@contextmanager
+def ingest_mode(es: Elasticsearch, index_name: str, force_merge_segments: int = 1):
+    """
+    Context manager for a full load: disables refresh and replicas on the index while the block runs,
+    then refreshes, force-merges and restores the previous settings.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The name of the Elasticsearch index (or an alias pointing to one index).
+        force_merge_segments (int): Number of segments to merge down to after the load, None to skip merging.
+    """
+    settings = es.indices.get_settings(index=index_name, include_defaults=True)
+    index_settings = next(iter(settings.values()))
+    current = {**index_settings["defaults"].get("index", {}), **index_settings["settings"]["index"]}
+    previous = {"refresh_interval": current.get("refresh_interval", "1s"),
+                "number_of_replicas": current.get("number_of_replicas", "1")}
+
+    print(f"Switching '{index_name}' to ingest mode (previous settings: {previous})...")
+    es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": "-1", "number_of_replicas": 0}})
+    try:
+        yield
+    finally:
+        es.indices.refresh(index=index_name)
+        if force_merge_segments:
+            es.options(request_timeout=3600).indices.forcemerge(index=index_name, max_num_segments=force_merge_segments)
+        es.indices.put_settings(index=index_name, settings={"index": previous})
+        print(f"Restored settings of '{index_name}'.")
+
+
+def bulk_load_documents(es: Elasticsearch, index_name: str, documents: Iterable[dict], chunk_size: int = 500,
+                        max_chunk_bytes: int = 10 * 1024 * 1024, thread_count: int = 4,
+                        full_load: bool = False, id_fn: Callable[[dict], str] = None,
+                        size_sample_every: int = 100) -> bool:
     """
     Load multiple documents to the specified Elasticsearch index using bulk indexing.
 
     Parameters:
         es (Elasticsearch): The Elasticsearch client instance.
         index_name (str): The name of the Elasticsearch index.
-        documents (list[dict]): List of documents to be loaded.
+        documents (Iterable[dict]): Documents to be loaded.
+        chunk_size (int): Maximum number of documents per bulk request.
+        max_chunk_bytes (int): Maximum payload size of a bulk request.
+        thread_count (int): Number of bulk requests sent in parallel.
+        full_load (bool): Run the load in ingest mode (no refresh, no replicas, force-merge afterwards).
+        id_fn (Callable[[dict], str]): Derives the document `_id`.
+        size_sample_every (int): Serialise one document in this many to estimate the payload size.
 
     Returns:
         bool: True if the documents were successfully indexed, False otherwise.
     """
     print("Preparing documents for bulk indexing...")
-    actions = [
-        {
-            "_index": index_name,
-            "_source": doc
-        }
-        for doc in documents
-    ]
-
     try:
-        helpers.bulk(es, actions)
-        print(f"Successfully indexed {len(documents)} documents.")
-        return True
+        with ingest_mode(es, index_name) if full_load else nullcontext():
+            _, failed = stream_load_documents(es, index_name, documents, chunk_size=chunk_size,
+                                              max_chunk_bytes=max_chunk_bytes, thread_count=thread_count, id_fn=id_fn,
+                                              size_sample_every=size_sample_every)
+        return failed == 0
     except RequestError as e:
         print(f"Request error during bulk indexing: {e}")
     except ConnectionError as e:
@@ -84,3 +131,196 @@ def bulk_load_documents(es: Elasticsearch, index_name: str, documents: list[dict
     except Exception as e:
         print(f"An unexpected error occurred during bulk indexing: {e}")
     return False
+
+
+def stream_load_documents(es: Elasticsearch, index_name: str, documents: Iterable[dict], chunk_size: int = 500,
+                          thread_count: int = 1, id_fn: Callable[[dict], str] = None,
+                          max_chunk_bytes: int = 10 * 1024 * 1024, size_sample_every: int = 100) -> tuple[int, int]:
+    """
+    Load documents from an iterable without materialising them, using `streaming_bulk`
+    (or `parallel_bulk` when `thread_count` > 1). Bulk requests are cut by document count and
+    by payload size, since every document carries several dense vectors. Failed documents are
+    reported one by one, and the load throughput is printed in docs/s and an estimated MB/s,
+    extrapolated from the serialised size of one document in `size_sample_every`.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The name of the Elasticsearch index.
+        documents (Iterable[dict]): Documents to be loaded, consumed lazily.
+        chunk_size (int): Maximum number of documents per bulk request.
+        thread_count (int): Number of bulk requests sent in parallel.
+        id_fn (Callable[[dict], str]): Derives the document `_id`, so loading upserts instead of appending.
+        max_chunk_bytes (int): Maximum payload size of a bulk request.
+        size_sample_every (int): Serialise one document in this many to estimate the payload size.
+
+    Returns:
+        tuple[int, int]: Number of indexed and failed documents.
+    """
+    seen_docs, sampled_docs, sampled_bytes = 0, 0, 0
+
+    def to_action(doc: dict) -> dict:
+        nonlocal seen_docs, sampled_docs, sampled_bytes
+        if seen_docs % size_sample_every == 0:
+            sampled_docs += 1
+            sampled_bytes += len(dumps(doc))
+        seen_docs += 1
+        action = {
+            "_index": index_name,
+            "_source": doc
+        }
+        if id_fn is not None:
+            action["_id"] = id_fn(doc)
+        return action
+
+    actions = (to_action(doc) for doc in documents)
+
+    if thread_count > 1:
+        results = helpers.parallel_bulk(es, actions, thread_count=thread_count, chunk_size=chunk_size,
+                                        max_chunk_bytes=max_chunk_bytes, raise_on_error=False,
+                                        raise_on_exception=False)
+    else:
+        results = helpers.streaming_bulk(es, actions, chunk_size=chunk_size, max_chunk_bytes=max_chunk_bytes,
+                                         raise_on_error=False, raise_on_exception=False)
+
+    started = time.perf_counter()
+    indexed, failed = 0, 0
+    for ok, item in results:
+        if ok:
+            indexed += 1
+        else:
+            failed += 1
+            operation, details = next(iter(item.items()))
+            print(f"Failed to {operation} document {details.get('_id')}: {details.get('error')}")
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    payload_bytes = sampled_bytes / sampled_docs * seen_docs if sampled_docs else 0
+    print(f"Successfully indexed {indexed} documents, {failed} failed, in {elapsed:.1f}s "
+          f"({indexed / elapsed:.1f} docs/s, ~{payload_bytes / elapsed / 1024 / 1024:.2f} MB/s).")
+    return indexed, failed
+
+
+def get_etl_state(es: Elasticsearch, state_index: str, index_name: str) -> dict:
+    """
+    Read the ETL state (e.g. the publishedAt watermark) stored for an index.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        state_index (str): The index holding ETL state documents.
+        index_name (str): The index the state belongs to.
+
+    Returns:
+        dict: The stored state, empty if none was stored yet.
+    """
+    if not es.indices.exists(index=state_index):
+        return {}
+    response = es.options(ignore_status=404).get(index=state_index, id=index_name)
+    return response.get("_source", {}) if response.get("found") else {}
+
+
+def save_etl_state(es: Elasticsearch, state_index: str, index_name: str, **state) -> None:
+    """
+    Merge the given fields into the ETL state stored for an index.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        state_index (str): The index holding ETL state documents.
+        index_name (str): The index the state belongs to.
+        **state: Fields to store.
+    """
+    state["updated_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    es.update(index=state_index, id=index_name, doc=state, doc_as_upsert=True, refresh=True)
+
+
+def bump_generation(es: Elasticsearch, state_index: str, index_name: str) -> int:
+    """
+    Atomically increments the generation stamp stored with the ETL state of an index. Retrievers
+    compare it with the generation their cached results were computed at, so every completed load
+    invalidates them.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        state_index (str): The index holding ETL state documents.
+        index_name (str): The index or alias the state belongs to.
+
+    Returns:
+        int: The new generation.
+    """
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    response = es.update(
+        index=state_index,
+        id=index_name,
+        script={
+            "source": "ctx._source.generation = (ctx._source.generation == null ? 0 : ctx._source.generation) + 1; "
+                      "ctx._source.generation_at = params.now",
+            "params": {"now": now}
+        },
+        upsert={"generation": 1, "generation_at": now},
+        source=True,
+        refresh=True
+    )
+    generation = response["get"]["_source"]["generation"]
+    print(f"Index '{index_name}' is now at generation {generation}.")
+    return generation
+
+
+def latest_published_at(es: Elasticsearch, index_name: str) -> str | None:
+    """
+    Return the most recent `publishedAt` value in the index.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The name of the Elasticsearch index.
+
+    Returns:
+        str | None: The latest publication date, None if the index is empty.
+    """
+    response = es.search(index=index_name, size=0, aggs={"latest": {"max": {"field": "publishedAt"}}})
+    latest = response["aggregations"]["latest"]
+    return latest.get("value_as_string") if latest.get("value") is not None else None
+
+
+def delete_older_than(es: Elasticsearch, index_name: str, retention_days: int) -> int:
+    """
+    Delete documents published before the retention window with a single range delete.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The name of the Elasticsearch index.
+        retention_days (int): Number of days of articles to keep.
+
+    Returns:
+        int: Number of deleted documents.
+    """
+    response = es.delete_by_query(
+        index=index_name,
+        query={"range": {"publishedAt": {"lt": f"now-{retention_days}d/d"}}},
+        conflicts="proceed"
+    )
+    print(f"Expired {response['deleted']} documents older than {retention_days} days from '{index_name}'.")
+    return response["deleted"]
+
+
+def filter_unchanged(es: Elasticsearch, index_name: str, documents: list[dict], id_fn: Callable[[dict], str],
+                     hash_fn: Callable[[dict], str]) -> list[dict]:
+    """
+    Drop documents whose stored `content_hash` equals the hash of the incoming version.
+
+    Parameters:
+        es (Elasticsearch): The Elasticsearch client instance.
+        index_name (str): The name of the Elasticsearch index.
+        documents (list[dict]): Incoming documents.
+        id_fn (Callable[[dict], str]): Derives the document `_id`.
+        hash_fn (Callable[[dict], str]): Hashes the content of an incoming document.
+
+    Returns:
+        list[dict]: Documents that are new or changed.
+    """
+    if not documents:
+        return documents
+
+    response = es.mget(index=index_name, ids=[id_fn(doc) for doc in documents], source=["content_hash"])
+    stored = {
+        hit["_id"]: hit["_source"].get("content_hash")
+        for hit in response["docs"] if hit.get("found")
+    }
+    return [doc for doc in documents if stored.get(id_fn(doc)) != hash_fn(doc)]